@@ -2,18 +2,37 @@ import streamlit as st
 import chess
 import chess.engine
 import random
-from PIL import Image, ImageDraw, ImageFont
 import sys
 import asyncio
 import io
 import os
+import time
+import uuid
+
+from async_engine import POLL_INTERVAL, cancel_jobs, cancel_stale_jobs, engine_job, get_async_engine, jobs_pending
+from board_layers import PUZZLE_SQUARE_SIZE
+from board_render import render_puzzle_board
+from engine_pool import STOCKFISH_PATH, get_engine_pool
+from engine_scheduler import HINT, EngineOverloaded
+from image_encoding import encode_image
+from puzzle_positions import random_puzzle_board
+from render_cache import board_key, render_cache
+from render_service import render_encoded
+from search_control import SearchProfile, get_search_controller
+from utils import get_basic_ai_move
 
 if sys.platform.startswith('win'):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 # === CONFIGURATION ===
-STOCKFISH_PATH = r"C:\Users\omote\Desktop\stockfish\stockfish.exe"
-PIECE_FOLDER = "assets"
+BOARD_IMAGE_ENCODING = "png-palette"  # "png-palette", "webp-lossless" or "png-fast"
+RENDER_WORKERS = 0  # > 0 renders boards in a shared process pool
+# Depth caps set playing strength; budgets (seconds) bound how long a click can wait
+HINT_PROFILES = {"Easy": SearchProfile(8, 0.4), "Medium": SearchProfile(12, 0.7), "Hard": SearchProfile(16, 1.0)}
+REPLY_PROFILES = {"Easy": SearchProfile(6, 0.3), "Medium": SearchProfile(10, 0.6), "Hard": SearchProfile(14, 1.0)}
+# While the engines are overloaded, hints and the AI's moves at these levels come from the built-in AI.
+FALLBACK_DIFFICULTIES = ("Easy",)
+FALLBACK_NOTICE = "⚡ Engines are busy, so this answer comes from the quick built-in AI"
 
 # === PAGE CONFIGURATION ===
 st.set_page_config(
@@ -40,6 +59,14 @@ if "total_score" not in st.session_state:
     st.session_state.total_score = 0
 if "puzzle_start_time" not in st.session_state:
     st.session_state.puzzle_start_time = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # engine scheduler fairness key
+if "engine_jobs" not in st.session_state:
+    st.session_state.engine_jobs = {}  # name -> (future, fen)
+if "speculative_replies" not in st.session_state:
+    st.session_state.speculative_replies = {}  # candidate move uci -> (future, fen before the move)
+if "quick_hints" not in st.session_state:
+    st.session_state.quick_hints = (None, [])  # (fen, moves) from the built-in AI
 
 # === COMPACT CSS STYLING ===
 st.markdown("""
@@ -209,43 +236,34 @@ section[data-testid="stSidebar"] * {
 </style>
 """, unsafe_allow_html=True)
 
-# === LOAD STOCKFISH ENGINE ===
+# === LOAD STOCKFISH ENGINE POOL ===
 @st.cache_resource
 def load_engine():
     if not os.path.exists(STOCKFISH_PATH):
         st.warning("⚠️ Stockfish not found. Using basic AI.")
         return None
     try:
-        engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
-        return engine
+        pool = get_engine_pool(STOCKFISH_PATH)
+        with pool.lease():  # start one engine now so a bad binary is reported here
+            pass
+        return pool
     except Exception as e:
         st.warning(f"⚠️ Could not load Stockfish: {e}")
         return None
 
 # === BASIC AI FALLBACK ===
-def get_basic_ai_move(board):
-    """Simple AI that prioritizes captures, then random moves"""
-    legal_moves = list(board.legal_moves)
-    if not legal_moves:
-        return None
-   
-    # Prioritize captures
-    captures = [move for move in legal_moves if board.is_capture(move)]
-    if captures:
-        return random.choice(captures)
-   
-    # Then checks
-    checks = []
-    for move in legal_moves:
-        board_copy = board.copy()
-        board_copy.push(move)
-        if board_copy.is_check():
-            checks.append(move)
-    if checks:
-        return random.choice(checks)
-   
-    # Random move
-    return random.choice(legal_moves)
+def quick_hints(board, count=3):
+    """Engine-free hints, kept per position so the move buttons stay put across reruns"""
+    fen = board.fen()
+    if st.session_state.quick_hints[0] != fen:
+        best = get_basic_ai_move(board)
+        moves = [best] if best else []
+        moves += [move for move in board.legal_moves if move != best][:count - len(moves)]
+        st.session_state.quick_hints = (fen, moves)
+    return st.session_state.quick_hints[1]
+
+def job_running(jobs, name, fen):
+    return name in jobs and jobs[name][1] == fen
 
 # === SCORING SYSTEM ===
 def calculate_score(difficulty, moves, time_taken, result):
@@ -272,142 +290,36 @@ def calculate_score(difficulty, moves, time_taken, result):
 
 # === PUZZLE GENERATION ===
 def generate_puzzle_fen(difficulty="Medium"):
-    """Generate a 2-piece puzzle with varying difficulty"""
+    """Generate a 2-piece puzzle with varying difficulty, drawn uniformly from all legal placements"""
     piece_sets = {
         "Easy": [('Q', 'r'), ('R', 'q'), ('Q', 'b'), ('R', 'r')],
         "Medium": [('Q', 'n'), ('R', 'b'), ('B', 'q'), ('N', 'r')],
-        "Hard": [('N', 'n'), ('B', 'b'), ('R', 'n'), ('Q', 'k')]
+        "Hard": [('N', 'n'), ('B', 'b'), ('R', 'n')]
     }
    
-    attempts = 0
-    while attempts < 50:
-        attempts += 1
-        squares = random.sample(chess.SQUARES, 4)
-        board = chess.Board(None)
-
-        king_squares = [sq for sq in squares[:2] if chess.square_distance(squares[0], squares[1]) > 1]
-        if len(king_squares) < 2:
-            continue
-           
-        board.set_piece_at(king_squares[0], chess.Piece.from_symbol('K'))
-        board.set_piece_at(king_squares[1], chess.Piece.from_symbol('k'))
-
-        white_piece, black_piece = random.choice(piece_sets[difficulty])
-        remaining_squares = [sq for sq in squares[2:] if sq not in king_squares]
-       
-        if len(remaining_squares) >= 2:
-            board.set_piece_at(remaining_squares[0], chess.Piece.from_symbol(white_piece))
-            board.set_piece_at(remaining_squares[1], chess.Piece.from_symbol(black_piece))
-        else:
+    white_piece, black_piece = random.choice(piece_sets[difficulty])
+    return random_puzzle_board(white_piece, black_piece).fen()
+
+# === SPECULATIVE AI REPLIES ===
+def speculate_replies(board, candidate_moves):
+    """Search the AI's reply to each candidate move while the student is still choosing"""
+    reply_profile = REPLY_PROFILES[st.session_state.difficulty]
+    for move in candidate_moves:
+        child = board.copy()
+        child.push(move)
+        if child.is_game_over():
             continue
-
-        board.turn = chess.WHITE
-
-        if board.is_valid() and not board.is_checkmate() and not board.is_stalemate():
-            return board.fen()
-   
-    return "8/8/8/3k4/8/3K4/3Q4/3r4 w - - 0 1"
+        engine_job(st.session_state.speculative_replies, move.uci(), board.fen(),
+                   lambda child=child: search_controller.search(child, reply_profile, interactive=False,
+                                                                session=st.session_state.session_id))
 
 # === OPTIMIZED BOARD DRAWING ===
 def draw_board_with_arrows(board, move_arrows=None, suggested_moves=None):
-    # Optimized sizes for perfect screen fit
-    square_size = 45
-    board_size = square_size * 8
-    margin = 25
-    img_size = board_size + 2 * margin
-   
-    img = Image.new("RGB", (img_size, img_size), "#9FEDD7")
-    draw = ImageDraw.Draw(img)
-   
-    try:
-        font_large = ImageFont.truetype("arial.ttf", 12)
-        font_small = ImageFont.truetype("arial.ttf", 9)
-    except:
-        font_large = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-
-    light_square = (254, 249, 199)
-    dark_square = (252, 225, 129)
-   
-    # Draw squares with highlights
-    for rank in range(8):
-        for file in range(8):
-            x = margin + file * square_size
-            y = margin + (7 - rank) * square_size
-           
-            color = light_square if (rank + file) % 2 == 0 else dark_square
-            draw.rectangle([x, y, x + square_size, y + square_size], fill=color)
-           
-            # Highlight suggested moves
-            if suggested_moves:
-                square = chess.square(file, rank)
-                for move in suggested_moves:
-                    if move.to_square == square:
-                        draw.rectangle([x + 2, y + 2, x + square_size - 2, y + square_size - 2],
-                                     outline="#026670", width=2)
-                    elif move.from_square == square:
-                        draw.rectangle([x + 2, y + 2, x + square_size - 2, y + square_size - 2],
-                                     outline="#9FEDD7", width=2)
-   
-    # Draw pieces
-    for rank in range(8):
-        for file in range(8):
-            piece = board.piece_at(chess.square(file, rank))
-            if piece:
-                x = margin + file * square_size
-                y = margin + (7 - rank) * square_size
-               
-                color_prefix = 'w' if piece.color == chess.WHITE else 'b'
-                piece_symbol = piece.symbol().upper()
-                piece_path = f"{PIECE_FOLDER}/{color_prefix}{piece_symbol}.png"
-               
-                try:
-                    piece_img = Image.open(piece_path).resize((square_size - 6, square_size - 6))
-                    img.paste(piece_img, (x + 3, y + 3), piece_img if piece_img.mode == 'RGBA' else None)
-                except:
-                    piece_unicode = {
-                        'K': '♔', 'Q': '♕', 'R': '♖', 'B': '♗', 'N': '♘', 'P': '♙',
-                        'k': '♚', 'q': '♛', 'r': '♜', 'b': '♝', 'n': '♞', 'p': '♟'
-                    }
-                    symbol = piece_unicode.get(piece.symbol(), piece.symbol())
-                    draw.text((x + square_size//2 - 6, y + square_size//2 - 6),
-                             symbol, fill="#026670", font=font_large)
-   
-    # Draw move arrows
-    if move_arrows:
-        for move in move_arrows:
-            from_file = chess.square_file(move.from_square)
-            from_rank = chess.square_rank(move.from_square)
-            to_file = chess.square_file(move.to_square)
-            to_rank = chess.square_rank(move.to_square)
-           
-            start_x = margin + from_file * square_size + square_size // 2
-            start_y = margin + (7 - from_rank) * square_size + square_size // 2
-            end_x = margin + to_file * square_size + square_size // 2
-            end_y = margin + (7 - to_rank) * square_size + square_size // 2
-           
-            draw.line([(start_x, start_y), (end_x, end_y)], fill="#026670", width=3)
-           
-            import math
-            angle = math.atan2(end_y - start_y, end_x - start_x)
-            arrowhead_length = 8
-            arrowhead_angle = math.pi / 6
-           
-            x1 = end_x - arrowhead_length * math.cos(angle - arrowhead_angle)
-            y1 = end_y - arrowhead_length * math.sin(angle - arrowhead_angle)
-            x2 = end_x - arrowhead_length * math.cos(angle + arrowhead_angle)
-            y2 = end_y - arrowhead_length * math.sin(angle + arrowhead_angle)
-           
-            draw.polygon([(end_x, end_y), (x1, y1), (x2, y2)], fill="#026670")
-
-    # Draw coordinates
-    for i in range(8):
-        draw.text((5, margin + (7 - i) * square_size + square_size//2 - 4),
-                 str(i + 1), fill="#026670", font=font_small)
-        draw.text((margin + i * square_size + square_size//2 - 2, img_size - 18),
-                 chr(ord('a') + i), fill="#026670", font=font_small)
-
-    return img
+    key = board_key(board, "puzzle", PUZZLE_SQUARE_SIZE, arrows=move_arrows,
+                    highlights=suggested_moves, encoding=BOARD_IMAGE_ENCODING)
+    render_local = lambda: encode_image(render_puzzle_board(board, move_arrows, suggested_moves),
+                                        BOARD_IMAGE_ENCODING)
+    return render_cache.get_or_render(key, lambda: render_encoded(key, render_local, RENDER_WORKERS))
 
 # === MAIN APP LAYOUT ===
 st.title("♟️ Chess Puzzle: 2-Piece Battle")
@@ -420,7 +332,48 @@ if st.session_state.fen is None:
     st.session_state.puzzle_start_time = time.time()
 
 board = chess.Board(st.session_state.fen)
-engine = load_engine()
+engine_pool = load_engine()
+async_engine = get_async_engine(engine_pool) if engine_pool else None
+search_controller = get_search_controller(async_engine) if engine_pool else None
+# Checked once per rerun; the scheduler recovers by itself once the queue drains
+engines_busy = bool(engine_pool) and async_engine.scheduler.overloaded()
+
+# === AI REPLY ===
+# The reply is searched in the background and played on the rerun after it arrives
+if engine_pool and board.turn == chess.BLACK and not board.is_game_over():
+    reply_profile = REPLY_PROFILES[st.session_state.difficulty]
+    ai_move = None
+    if (engines_busy and st.session_state.difficulty in FALLBACK_DIFFICULTIES
+            and not job_running(st.session_state.engine_jobs, "reply", board.fen())):
+        st.caption(FALLBACK_NOTICE)
+        ai_move = get_basic_ai_move(board)
+    else:
+        reply = engine_job(st.session_state.engine_jobs, "reply", board.fen(),
+                           lambda: search_controller.search(board, reply_profile, session=st.session_state.session_id))
+        if reply.done():
+            del st.session_state.engine_jobs["reply"]
+            try:
+                ai_move = reply.result()["pv"][0]
+            except EngineOverloaded:
+                # Shed while queued; only the fallback levels may play the basic AI's move
+                if st.session_state.difficulty in FALLBACK_DIFFICULTIES:
+                    st.caption(FALLBACK_NOTICE)
+                    ai_move = get_basic_ai_move(board)
+                else:
+                    engine_job(st.session_state.engine_jobs, "reply", board.fen(),
+                               lambda: search_controller.search(board, reply_profile,
+                                                                session=st.session_state.session_id))
+                    st.info("🤖 AI is thinking...")
+            except Exception as e:
+                st.error(f"AI Error: {e}")
+                ai_move = get_basic_ai_move(board)
+        else:
+            st.info("🤖 AI is thinking...")
+    if ai_move:
+        board.push(ai_move)
+        st.session_state.fen = board.fen()
+        st.session_state.current_game_moves += 1
+        st.session_state.current_move_arrows = [ai_move]
 
 # === SIDEBAR ===
 with st.sidebar:
@@ -468,6 +421,8 @@ with st.sidebar:
         st.session_state.fen = generate_puzzle_fen(st.session_state.difficulty)
         st.session_state.current_move_arrows = []
         st.session_state.current_game_moves = 0
+        cancel_jobs(st.session_state.engine_jobs)
+        cancel_jobs(st.session_state.speculative_replies)
         import time
         st.session_state.puzzle_start_time = time.time()
         st.rerun()
@@ -577,11 +532,31 @@ if board.turn == chess.WHITE and not board.is_game_over():
     st.markdown("### 💡 Your Move Options")
    
     try:
-        if engine:
-            depth_map = {"Easy": 8, "Medium": 12, "Hard": 16}
-            depth = depth_map[st.session_state.difficulty]
-            suggestions = engine.analyse(board, chess.engine.Limit(depth=depth), multipv=3)
-            moves_to_show = [result["pv"][0] for result in suggestions]
+        if engine_pool:
+            hint_profile = HINT_PROFILES[st.session_state.difficulty]
+            hints = None
+            if not engines_busy or job_running(st.session_state.engine_jobs, "hints", board.fen()):
+                hints = engine_job(st.session_state.engine_jobs, "hints", board.fen(),
+                                   lambda: search_controller.search(board, hint_profile, multipv=3, priority=HINT,
+                                                                    session=st.session_state.session_id))
+            if hints is None or (hints.done() and isinstance(hints.exception(), EngineOverloaded)):
+                st.caption(FALLBACK_NOTICE)
+                moves_to_show = quick_hints(board)
+            elif hints.done():
+                suggestions = hints.result()
+                moves_to_show = [result["pv"][0] for result in suggestions]
+                if not engines_busy:
+                    speculate_replies(board, moves_to_show)
+            elif hints.latest():
+                # Shallow iterations show right away as text; buttons wait for the final
+                # result so they do not reshuffle while the student is clicking
+                preview = [result["pv"][0] for result in hints.latest()]
+                st.info("💭 Best so far: " + ", ".join(
+                    f"{chess.square_name(move.from_square)}-{chess.square_name(move.to_square)}" for move in preview))
+                moves_to_show = []
+            else:
+                st.info("💭 Finding your best moves...")
+                moves_to_show = []
         else:
             legal_moves = list(board.legal_moves)
             moves_to_show = random.sample(legal_moves, min(3, len(legal_moves)))
@@ -599,7 +574,7 @@ if board.turn == chess.WHITE and not board.is_game_over():
                 elif board.gives_check(move):
                     move_desc += " ⚠️"
                
-                if st.button(move_desc, key=f"move_{i}"):
+                if st.button(move_desc, key=f"move_{move.uci()}"):
                     # Show move arrow
                     st.session_state.current_move_arrows = [move]
                    
@@ -608,16 +583,25 @@ if board.turn == chess.WHITE and not board.is_game_over():
                     st.session_state.fen = board.fen()
                     st.session_state.current_game_moves += 1
                    
-                    # AI response
-                    if not board.is_game_over():
+                    # With Stockfish the reply is searched in the background (see AI REPLY).
+                    # A finished speculative search for this move is used as is. A pending one
+                    # runs at background priority, so an interactive search joins it (raising
+                    # it to interactive priority if still queued) before it is dropped.
+                    speculative = st.session_state.speculative_replies.pop(move.uci(), None)
+                    if speculative:
+                        reply = speculative[0]
+                        if board.is_game_over():
+                            reply.cancel()
+                        elif reply.done() and not reply.cancelled() and reply.exception() is None:
+                            st.session_state.engine_jobs["reply"] = (reply, board.fen())
+                        else:
+                            engine_job(st.session_state.engine_jobs, "reply", board.fen(),
+                                       lambda: search_controller.search(board, REPLY_PROFILES[st.session_state.difficulty],
+                                                                        session=st.session_state.session_id))
+                            reply.cancel()
+                    if not board.is_game_over() and not engine_pool:
                         try:
-                            if engine:
-                                depth_map = {"Easy": 6, "Medium": 10, "Hard": 14}
-                                ai_depth = depth_map[st.session_state.difficulty]
-                                ai_result = engine.analyse(board, chess.engine.Limit(depth=ai_depth))
-                                ai_move = ai_result["pv"][0]
-                            else:
-                                ai_move = get_basic_ai_move(board)
+                            ai_move = get_basic_ai_move(board)
                            
                             if ai_move:
                                 board.push(ai_move)
@@ -656,4 +640,12 @@ st.markdown("""
 <div class="footer">
     🎯 Master tactical chess skills through 2-piece battles! Each puzzle challenges your strategic thinking.
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# === BACKGROUND ENGINE WORK ===
+# Searches run on the engine pool; rerun shortly to pick up their results.
+# Speculative replies are only needed once a move is clicked, so they never trigger a rerun.
+cancel_stale_jobs(st.session_state.speculative_replies, board.fen())
+if jobs_pending(st.session_state.engine_jobs, board.fen()):
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
\ No newline at end of file
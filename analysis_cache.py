@@ -0,0 +1,237 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import chess
+import chess.engine
+import chess.polyglot
+
+DEFAULT_MAX_POSITIONS = 4096
+# Set to a file path to keep analyses across restarts and share them between server processes.
+DEFAULT_DB_PATH = os.environ.get("CHESS_ANALYSIS_DB", "")
+STORED_FIELDS = ("depth", "seldepth", "nodes", "time", "multipv")
+
+
+def position_key(board):
+    return chess.polyglot.zobrist_hash(board)
+
+
+def limit_key(limit):
+    """('depth'|'time'|'nodes', amount) for a single-constraint limit, or None if it cannot be cached"""
+    constraints = [(name, getattr(limit, name)) for name in ("depth", "time", "nodes")
+                   if getattr(limit, name) is not None]
+    clock = (limit.white_clock, limit.black_clock, limit.mate)
+    if len(constraints) != 1 or any(value is not None for value in clock):
+        return None
+    return constraints[0]
+
+
+def request_keys(limit):
+    """Limit keys of which any one answers a request for limit, or None if it cannot be cached.
+
+    An engine stops at whichever constraint of a limit is met first, so a
+    request for depth 20 or 1.5 seconds is answered by an analysis that
+    reached depth 20 as well as by one that searched for 1.5 seconds.
+    """
+    constraints = [(name, getattr(limit, name)) for name in ("depth", "time", "nodes")
+                   if getattr(limit, name) is not None]
+    clock = (limit.white_clock, limit.black_clock, limit.mate)
+    if not constraints or any(value is not None for value in clock):
+        return None
+    return constraints
+
+
+def achieved_depth(infos):
+    return min((info.get("depth", 0) for info in infos), default=0)
+
+
+def satisfies(entry, wanted, multipv):
+    """Whether a cached (limit_key, multipv, infos) entry answers a request for wanted/multipv"""
+    entry_limit, entry_multipv, infos = entry
+    if entry_multipv < multipv:
+        return False
+    kind, amount = wanted
+    if kind == "depth" and achieved_depth(infos) >= amount:
+        return True
+    return entry_limit[0] == kind and entry_limit[1] >= amount
+
+
+def encode_score(score):
+    return str(score.white())
+
+
+def decode_score(text):
+    if text == "#+0":
+        score = chess.engine.MateGiven
+    elif text.startswith("#"):
+        score = chess.engine.Mate(int(text[1:]))
+    else:
+        score = chess.engine.Cp(int(text))
+    return chess.engine.PovScore(score, chess.WHITE)
+
+
+def from_side_to_move(infos, board):
+    """infos with scores seen from board's side to move, as a live engine reports them"""
+    return [dict(info, score=chess.engine.PovScore(info["score"].pov(board.turn), board.turn))
+            if "score" in info else info for info in infos]
+
+
+def encode_infos(infos):
+    lines = []
+    for info in infos:
+        line = {name: info[name] for name in STORED_FIELDS if name in info}
+        if "score" in info:
+            line["score"] = encode_score(info["score"])
+        line["pv"] = [move.uci() for move in info.get("pv", [])]
+        lines.append(line)
+    return json.dumps(lines)
+
+
+def decode_infos(payload):
+    infos = []
+    for line in json.loads(payload):
+        info = {name: line[name] for name in STORED_FIELDS if name in line}
+        if "score" in line:
+            info["score"] = decode_score(line["score"])
+        info["pv"] = [chess.Move.from_uci(uci) for uci in line["pv"]]
+        infos.append(info)
+    return infos
+
+
+class AnalysisDatabase:
+    """SQLite tier of the analysis cache"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis ("
+                " position TEXT, kind TEXT, amount REAL, multipv INTEGER, payload TEXT,"
+                " PRIMARY KEY (position, kind, amount, multipv))"
+            )
+
+    def load(self, key):
+        """Every stored entry for a position as (limit_key, multipv, infos)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, amount, multipv, payload FROM analysis WHERE position = ?", (f"{key:016x}",)
+            ).fetchall()
+        return [((kind, amount), multipv, decode_infos(payload)) for kind, amount, multipv, payload in rows]
+
+    def store(self, key, limit, multipv, infos):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?)",
+                (f"{key:016x}", limit[0], limit[1], multipv, encode_infos(infos)),
+            )
+
+
+class AnalysisCache:
+    """Engine analyses keyed by Zobrist hash, search limit and multipv.
+
+    A request is answered by any stored analysis of the same position that
+    searched at least as hard: a deeper (or longer, or wider multipv) result
+    satisfies a shallower request, and a limit combining several constraints
+    is answered by an analysis meeting any one of them. Positions are evicted least recently used
+    first; with a database, entries are also persisted and reloaded on a miss.
+    """
+
+    def __init__(self, max_positions=DEFAULT_MAX_POSITIONS, database=None):
+        self.max_positions = max_positions
+        self.database = database
+        self.hits = 0
+        self.misses = 0
+        self.database_hits = 0
+        self.evictions = 0
+        self._positions = OrderedDict()  # zobrist -> [(limit_key, multipv, infos)]
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, wanted, multipv):
+        entries = self._positions.get(key)
+        if entries is None:
+            return None
+        self._positions.move_to_end(key)
+        for entry in entries:
+            if any(satisfies(entry, constraint, multipv) for constraint in wanted):
+                return entry[2][:multipv]
+        return None
+
+    def _remember(self, key, entry):
+        entries = self._positions.setdefault(key, [])
+        # Drop entries the new one makes redundant.
+        entries[:] = [old for old in entries if not (old[1] <= entry[1] and satisfies(entry, old[0], old[1]))]
+        entries.append(entry)
+        self._positions.move_to_end(key)
+        while len(self._positions) > self.max_positions:
+            self._positions.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, board, limit, multipv=1):
+        """Cached infos (a list of multipv lines) for the request, or None"""
+        wanted = request_keys(limit)
+        if wanted is None:
+            return None
+        key = position_key(board)
+        with self._lock:
+            infos = self._lookup(key, wanted, multipv)
+            if infos is not None:
+                self.hits += 1
+                return from_side_to_move(infos, board)
+        if self.database is not None:
+            stored = self.database.load(key)
+            with self._lock:
+                for entry in stored:
+                    self._remember(key, entry)
+                infos = self._lookup(key, wanted, multipv)
+                if infos is not None:
+                    self.hits += 1
+                    self.database_hits += 1
+                    return from_side_to_move(infos, board)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, board, limit, multipv, infos):
+        wanted = limit_key(limit)
+        if wanted is None or not infos:
+            return
+        key = position_key(board)
+        with self._lock:
+            self._remember(key, (wanted, multipv, list(infos)))
+        if self.database is not None:
+            self.database.store(key, wanted, multipv, infos)
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "positions": len(self._positions),
+                "max_positions": self.max_positions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "database_hits": self.database_hits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "database": self.database.path if self.database else None,
+            }
+
+
+def default_database():
+    """SQLite tier from CHESS_ANALYSIS_DB, or None when unset or unusable"""
+    if not DEFAULT_DB_PATH:
+        return None
+    try:
+        return AnalysisDatabase(DEFAULT_DB_PATH)
+    except sqlite3.Error:
+        return None
+
+
+analysis_cache = AnalysisCache(database=default_database())
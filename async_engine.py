@@ -0,0 +1,128 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import chess.engine
+
+from engine_scheduler import BACKGROUND, EngineScheduler
+
+# How long a page waits before rerunning to check on a pending engine future.
+POLL_INTERVAL = 0.1
+
+
+def transfer_outcome(source, target):
+    """Copy the outcome of a finished future into target unless it was cancelled"""
+    try:
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+    except concurrent.futures.InvalidStateError:
+        pass
+
+
+class AsyncEngine:
+    """Non-blocking front-end to an EnginePool.
+
+    play() and analyse() return a concurrent.futures.Future immediately. The
+    command runs as a coroutine on the leased engine's own asyncio loop, so no
+    thread waits on UCI I/O, and the engine goes back to the pool as soon as
+    the search finishes. Cancelling the future stops the search. Caching
+    belongs to the caller (search_control.SearchController). Engines are handed out by an EngineScheduler, so every call takes a
+    priority and the session it is for.
+    """
+
+    def __init__(self, pool, scheduler=None):
+        self.pool = pool
+        self.scheduler = scheduler or EngineScheduler(pool)
+
+    def run(self, make_coro, priority=BACKGROUND, session=None):
+        """Run the coroutine make_coro(protocol) on a pooled engine's loop"""
+        result = concurrent.futures.Future()
+        lease = self.scheduler.request(priority, session)
+
+        def on_engine(lease):
+            if lease.cancelled():
+                return
+            if lease.exception() is not None:
+                transfer_outcome(lease, result)
+                return
+            engine = lease.result()
+            if result.done():
+                self.scheduler.checkin(engine)
+                return
+            job = asyncio.run_coroutine_threadsafe(make_coro(engine.protocol), engine.protocol.loop)
+            result.add_done_callback(lambda _: job.cancel() if result.cancelled() else None)
+            job.add_done_callback(lambda job: finish(engine, job))
+
+        def finish(engine, job):
+            broken = not job.cancelled() and isinstance(
+                job.exception(), (chess.engine.EngineTerminatedError, chess.engine.EngineError))
+            self.scheduler.checkin(engine, broken=broken)
+            transfer_outcome(job, result)
+
+        result.add_done_callback(lambda _: lease.cancel() if result.cancelled() else None)
+        lease.add_done_callback(on_engine)
+        return result
+
+    def submit(self, command, board, limit, priority=BACKGROUND, session=None, **kwargs):
+        """Run engine.protocol.<command>(board, limit, **kwargs) on a pooled engine"""
+        board = board.copy()
+        return self.run(lambda protocol: getattr(protocol, command)(board, limit, **kwargs), priority, session)
+
+    def play(self, board, limit, priority=BACKGROUND, session=None, **kwargs):
+        """Future of a chess.engine.PlayResult"""
+        return self.submit("play", board, limit, priority, session, **kwargs)
+
+    def analyse(self, board, limit, multipv=None, priority=BACKGROUND, session=None, **kwargs):
+        """Future of an InfoDict, or a list of them when multipv is given"""
+        return self.submit("analyse", board, limit, priority, session, multipv=multipv, **kwargs)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_async_engine(pool):
+    """Shared AsyncEngine for a pool"""
+    with _engines_lock:
+        engine = _engines.get(id(pool))
+        if engine is None or engine.pool is not pool:
+            engine = _engines[id(pool)] = AsyncEngine(pool)
+        return engine
+
+
+def engine_job(jobs, name, fen, start):
+    """Future of jobs[name] for position fen, started with start() unless already running for it.
+
+    jobs is a dict kept in session state mapping name -> (future, fen); a job
+    left over from another position is cancelled and replaced.
+    """
+    job = jobs.get(name)
+    if job is None or job[1] != fen:
+        if job:
+            job[0].cancel()
+        job = jobs[name] = (start(), fen)
+    return job[0]
+
+
+def cancel_jobs(jobs):
+    for future, _ in jobs.values():
+        future.cancel()
+    jobs.clear()
+
+
+def cancel_stale_jobs(jobs, fen):
+    """Cancel and forget jobs started for a position other than fen"""
+    for name, (future, job_fen) in list(jobs.items()):
+        if job_fen != fen:
+            future.cancel()
+            del jobs[name]
+
+
+def jobs_pending(jobs, fen):
+    """True while a job for fen is still running; jobs for other positions are cancelled"""
+    cancel_stale_jobs(jobs, fen)
+    return any(not future.done() for future, _ in jobs.values())
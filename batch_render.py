@@ -0,0 +1,170 @@
+"""Render many board positions to thumbnails or contact sheets.
+
+Usage:
+    python batch_render.py puzzles.epd --out-dir thumbs
+    python batch_render.py puzzles.fen --out-dir sheets --sheet 8x6 --workers 8
+
+Input lines may be FENs or EPDs; only the piece placement is used. Work is
+spread over a process pool, each worker keeping its own sprite atlas, and
+files are written by the workers as soon as each chunk is done.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+import chess
+from PIL import Image
+
+from image_encoding import DEFAULT_ENCODING, ENCODINGS, PNG_FAST, WEBP_LOSSLESS, encode_image
+from sprites import sprite_atlas
+from utils import render_board
+
+DEFAULT_SQUARE_SIZE = 32
+DEFAULT_CHUNK_SIZE = 64
+SHEET_GAP = 4
+
+
+def read_positions(lines):
+    """Yield board FENs from FEN/EPD lines, skipping blanks and comments"""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line.split()[0]
+
+
+def parse_board(board_fen):
+    board = chess.Board(None)
+    board.set_board_fen(board_fen)
+    return board
+
+
+def file_extension(encoding):
+    return "webp" if encoding == WEBP_LOSSLESS else "png"
+
+
+def init_worker(square_size):
+    sprite_atlas.preload((square_size,))
+
+
+def render_thumbnails(task):
+    """Worker: render and write one chunk of (index, fen) pairs; returns (written, failed)"""
+    items, out_dir, square_size, encoding = task
+    written = failed = 0
+    for index, board_fen in items:
+        try:
+            img = render_board(parse_board(board_fen), square_size)
+        except ValueError:
+            failed += 1
+            continue
+        path = os.path.join(out_dir, f"{index:07d}.{file_extension(encoding)}")
+        with open(path, "wb") as f:
+            f.write(encode_image(img, encoding))
+        written += 1
+    return written, failed
+
+
+def render_sheet(task):
+    """Worker: render one contact sheet from a chunk of (index, fen) pairs"""
+    items, out_dir, square_size, encoding, columns, rows = task
+    tile = 8 * square_size
+    sheet = Image.new("RGB", (columns * (tile + SHEET_GAP) + SHEET_GAP,
+                              rows * (tile + SHEET_GAP) + SHEET_GAP), "white")
+    written = failed = 0
+    for slot, (index, board_fen) in enumerate(items):
+        try:
+            img = render_board(parse_board(board_fen), square_size)
+        except ValueError:
+            failed += 1
+            continue
+        x = SHEET_GAP + (slot % columns) * (tile + SHEET_GAP)
+        y = SHEET_GAP + (slot // columns) * (tile + SHEET_GAP)
+        sheet.paste(img, (x, y))
+        written += 1
+    path = os.path.join(out_dir, f"sheet_{items[0][0]:07d}.{file_extension(encoding)}")
+    with open(path, "wb") as f:
+        f.write(encode_image(sheet, encoding))
+    return written, failed
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_positions(positions, out_dir, square_size=DEFAULT_SQUARE_SIZE, encoding=DEFAULT_ENCODING,
+                     workers=None, sheet=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Render an iterable of board FENs across a process pool.
+
+    sheet is None for one file per position, or (columns, rows) for contact
+    sheets. progress(written, failed, elapsed) is called after every chunk.
+    Returns a summary dict including images per second.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    indexed = enumerate(positions)
+
+    if sheet:
+        columns, rows = sheet
+        tasks = ((chunk, out_dir, square_size, encoding, columns, rows)
+                 for chunk in chunked(indexed, columns * rows))
+        worker = render_sheet
+    else:
+        tasks = ((chunk, out_dir, square_size, encoding) for chunk in chunked(indexed, chunk_size))
+        worker = render_thumbnails
+
+    written = failed = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(square_size,)) as pool:
+        for chunk_written, chunk_failed in pool.imap_unordered(worker, tasks):
+            written += chunk_written
+            failed += chunk_failed
+            if progress:
+                progress(written, failed, time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "written": written,
+        "failed": failed,
+        "seconds": elapsed,
+        "images_per_second": written / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_sheet(value):
+    columns, _, rows = value.lower().partition("x")
+    return int(columns), int(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render board thumbnails in parallel.")
+    parser.add_argument("input", help="FEN/EPD file, one position per line ('-' for stdin)")
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--square-size", type=int, default=DEFAULT_SQUARE_SIZE)
+    parser.add_argument("--format", choices=ENCODINGS, default=PNG_FAST)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--sheet", type=parse_sheet, default=None,
+                        help="write contact sheets of COLSxROWS boards instead of single files")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    def progress(written, failed, elapsed):
+        rate = written / elapsed if elapsed else 0.0
+        print(f"\r{written} images, {failed} failed, {rate:.0f} images/s", end="", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with source:
+        summary = render_positions(read_positions(source), args.out_dir, args.square_size, args.format,
+                                   args.workers, args.sheet, args.chunk_size, progress)
+    print(file=sys.stderr)
+    print(f"Rendered {summary['written']} images in {summary['seconds']:.1f}s "
+          f"({summary['images_per_second']:.0f} images/s, {summary['failed']} failed)")
+
+
+if __name__ == "__main__":
+    main()
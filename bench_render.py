@@ -0,0 +1,194 @@
+"""Benchmark the board renderers on a fixed corpus of positions.
+
+Usage:
+    python bench_render.py --out bench.json
+    python bench_render.py --out new.json --compare bench.json
+
+Every renderer is run on every corpus position at several square sizes,
+both cold (sprite, background and font caches cleared before each call) and
+warm. Results hold per-call latency percentiles, tracemalloc peak memory and
+the number of blocks still allocated after a call. They are saved as JSON,
+and --compare prints the p50 ratio of every case against an earlier run.
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import chess
+
+import board_layers
+from board_render import IncrementalBoardRenderer, render_game_board, render_puzzle_board
+from image_encoding import ENCODINGS, encode_image
+from render_cache import render_cache
+from sprites import sprite_atlas
+from utils import render_board
+
+CORPUS = {
+    "start": chess.STARTING_FEN,
+    "middlegame": "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP1B1PPP/R2QKB1R w KQ - 0 9",
+    "sparse_puzzle": "8/8/8/3k4/8/3K4/3Q4/3r4 w - - 0 1",
+    "sparse_minor": "8/2n5/8/5k2/8/1K6/6B1/8 w - - 0 1",
+    "many_arrows": "r3k2r/ppp2ppp/2nqbn2/3pp3/3PP3/2NQBN2/PPP2PPP/R3K2R w KQkq - 0 1",
+}
+REGRESSION_THRESHOLD = 1.2
+
+
+def all_legal_moves(board):
+    return list(board.legal_moves)
+
+
+def renderer_cases(square_sizes):
+    """(name, square_size, call(board)) for every renderer and size"""
+    cases = []
+    for size in square_sizes:
+        cases.append(("classic", size, lambda board, size=size: render_board(board, size)))
+        cases.append(("puzzle", size, lambda board, size=size: render_puzzle_board(board, square_size=size)))
+        cases.append(("puzzle_overlays", size, lambda board, size=size: render_puzzle_board(
+            board, all_legal_moves(board), all_legal_moves(board), size)))
+    cases.append(("game", 64, render_game_board))
+    return cases
+
+
+def clear_render_caches():
+    sprite_atlas.clear()
+    board_layers.background_layer.cache_clear()
+    board_layers.load_font.cache_clear()
+    render_cache.clear()
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "p50_ms": at(0.5) * 1000,
+        "p90_ms": at(0.9) * 1000,
+        "p99_ms": at(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def measure(call, repeat, cold):
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            clear_render_caches()
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+
+    # Memory is measured in a separate pass: tracemalloc slows every call.
+    if cold:
+        clear_render_caches()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    call()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    retained = sum(max(stat.count_diff, 0) for stat in stats)
+
+    result = percentiles(timings)
+    result["retained_blocks"] = retained
+    result["peak_kb"] = peak / 1024
+    return result
+
+
+def incremental_case(repeat):
+    """Per-move cost of the incremental game renderer over a short game"""
+    moves = ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6", "O-O", "Be7"]
+    timings = []
+    for _ in range(max(1, repeat // len(moves))):
+        board = chess.Board()
+        renderer = IncrementalBoardRenderer()
+        renderer.render(board)
+        for san in moves:
+            board.push_san(san)
+            start = time.perf_counter()
+            renderer.render(board)
+            timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+def run(square_sizes, repeat, cold_repeat, encoding=None):
+    results = []
+    for position_name, fen in CORPUS.items():
+        board = chess.Board(fen)
+        for name, size, render in renderer_cases(square_sizes):
+            if encoding:
+                call = lambda render=render: encode_image(render(board), encoding)
+            else:
+                call = lambda render=render: render(board)
+            for mode, count in (("cold", cold_repeat), ("warm", repeat)):
+                if mode == "warm":
+                    call()
+                entry = {"renderer": name, "position": position_name, "square_size": size, "mode": mode}
+                entry.update(measure(call, count, mode == "cold"))
+                results.append(entry)
+
+    entry = {"renderer": "game_incremental", "position": "ruy_lopez", "square_size": 64, "mode": "warm"}
+    entry.update(incremental_case(repeat))
+    results.append(entry)
+    return results
+
+
+def case_id(entry):
+    return f"{entry['renderer']}/{entry['position']}/{entry['square_size']}/{entry['mode']}"
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {case_id(entry): entry for entry in json.load(f)["results"]}
+    regressions = 0
+    for entry in results:
+        old = baseline.get(case_id(entry))
+        if not old or not old["p50_ms"]:
+            continue
+        ratio = entry["p50_ms"] / old["p50_ms"]
+        flag = "  REGRESSION" if ratio > REGRESSION_THRESHOLD else ""
+        regressions += bool(flag)
+        print(f"{case_id(entry):55s} {old['p50_ms']:8.2f} -> {entry['p50_ms']:8.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the board renderers.")
+    parser.add_argument("--out", default="bench_render.json")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[45, 64, 80])
+    parser.add_argument("--repeat", type=int, default=50, help="warm calls per case")
+    parser.add_argument("--cold-repeat", type=int, default=10, help="cold calls per case")
+    parser.add_argument("--encode", choices=ENCODINGS, default=None,
+                        help="include encoding to bytes in every timed call")
+    parser.add_argument("--compare", default=None, help="earlier JSON output to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.cold_repeat, args.encode)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "encoding": args.encode,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for entry in results:
+        print(f"{case_id(entry):55s} p50 {entry['p50_ms']:7.2f} ms  p99 {entry['p99_ms']:7.2f} ms"
+              f"  blocks {entry.get('retained_blocks', '-')}  peak {entry.get('peak_kb', 0):.0f} KB")
+    print(f"Saved {len(results)} results to {args.out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            raise SystemExit(f"{regressions} case(s) slower than x{REGRESSION_THRESHOLD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import functools
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Arial ships with Windows; DejaVu is the usual stand-in on Linux servers.
+FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf")
+# Bump whenever a change would alter rendered pixels, so persisted images are not reused.
+RENDER_VERSION = 1
+
+# === CLASSIC BOARD (utils) ===
+CLASSIC_LIGHT = (240, 217, 181)
+CLASSIC_DARK = (181, 136, 99)
+
+# === PUZZLE BOARD (Puzzles_2) ===
+PUZZLE_SQUARE_SIZE = 45
+PUZZLE_MARGIN = 25
+PUZZLE_BACKGROUND = "#9FEDD7"
+PUZZLE_LIGHT = (254, 249, 199)
+PUZZLE_DARK = (252, 225, 129)
+PUZZLE_INK = "#026670"
+
+# === GAME BOARD (chess_app_3) ===
+GAME_SQUARE_SIZE = 64
+GAME_MARGIN = 50
+GAME_LIGHT = (240, 217, 181)
+GAME_DARK = (181, 136, 99)
+GAME_BACKGROUND = (2, 102, 112)
+GAME_HIGHLIGHT = (255, 255, 0)
+
+
+@functools.lru_cache(maxsize=None)
+def font_name():
+    """The first of FONT_CANDIDATES installed here, or None for Pillow's built-in font"""
+    for name in FONT_CANDIDATES:
+        try:
+            ImageFont.truetype(name, 10)
+            return name
+        except IOError:
+            continue
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    """Load the coordinate font once per process and size"""
+    name = font_name()
+    if name is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(name, size)
+
+
+def render_signature():
+    """Identifies the renderer build and font, for caches that outlive the process"""
+    return f"v{RENDER_VERSION}-{font_name() or 'default'}"
+
+
+def file_labels(flipped):
+    return 'hgfedcba' if flipped else 'abcdefgh'
+
+
+def rank_labels(flipped):
+    """Rank labels from the top row of the image down"""
+    return '12345678' if flipped else '87654321'
+
+
+def draw_classic_background(square_size, flipped=False):
+    board_size = 8 * square_size
+    img = Image.new("RGB", (board_size, board_size), "white")
+    draw = ImageDraw.Draw(img)
+
+    for rank in range(8):
+        for file in range(8):
+            color = CLASSIC_LIGHT if (rank + file) % 2 == 0 else CLASSIC_DARK
+            top_left = (file * square_size, (7 - rank) * square_size)
+            bottom_right = ((file + 1) * square_size, (8 - rank) * square_size)
+            draw.rectangle([top_left, bottom_right], fill=color)
+
+    return img
+
+
+def draw_puzzle_background(square_size, flipped=False):
+    margin = PUZZLE_MARGIN
+    img_size = 8 * square_size + 2 * margin
+    img = Image.new("RGB", (img_size, img_size), PUZZLE_BACKGROUND)
+    draw = ImageDraw.Draw(img)
+    font_small = load_font(9)
+
+    for rank in range(8):
+        for file in range(8):
+            x = margin + file * square_size
+            y = margin + (7 - rank) * square_size
+            color = PUZZLE_LIGHT if (rank + file) % 2 == 0 else PUZZLE_DARK
+            draw.rectangle([x, y, x + square_size, y + square_size], fill=color)
+
+    ranks = rank_labels(flipped)
+    files = file_labels(flipped)
+    for i in range(8):
+        draw.text((5, margin + i * square_size + square_size//2 - 4),
+                 ranks[i], fill=PUZZLE_INK, font=font_small)
+        draw.text((margin + i * square_size + square_size//2 - 2, img_size - 18),
+                 files[i], fill=PUZZLE_INK, font=font_small)
+
+    return img
+
+
+def draw_game_background(square_size, flipped=False):
+    board_size = 8 * square_size
+    total_size = board_size + GAME_MARGIN
+    img = Image.new('RGB', (total_size, total_size), GAME_BACKGROUND)
+    draw = ImageDraw.Draw(img)
+    font = load_font(24)
+
+    for row in range(8):
+        for col in range(8):
+            square_color = GAME_LIGHT if (row + col) % 2 == 0 else GAME_DARK
+            x1 = GAME_MARGIN + col * square_size
+            y1 = row * square_size
+            draw.rectangle([x1, y1, x1 + square_size, y1 + square_size], fill=square_color)
+
+    for idx, char in enumerate(file_labels(flipped)):
+        x = GAME_MARGIN + idx * square_size + square_size // 2
+        y = board_size + 5
+        draw.text((x - 8, y), char, fill="white", font=font)
+
+    for idx, row_number in enumerate(rank_labels(flipped)):
+        x = 10
+        y = idx * square_size + square_size // 2 - 12
+        draw.text((x, y), row_number, fill="white", font=font)
+
+    return img
+
+
+BACKGROUND_BUILDERS = {
+    "classic": draw_classic_background,
+    "puzzle": draw_puzzle_background,
+    "game": draw_game_background,
+}
+
+
+@functools.lru_cache(maxsize=32)
+def background_layer(theme, square_size, flipped=False):
+    """Cached static layer for a theme, square size and orientation.
+
+    The returned image is shared: callers must copy() it before drawing.
+    """
+    return BACKGROUND_BUILDERS[theme](square_size, flipped)
@@ -0,0 +1,171 @@
+from PIL import ImageDraw
+import chess
+
+from board_layers import (
+    GAME_HIGHLIGHT,
+    GAME_MARGIN,
+    GAME_SQUARE_SIZE,
+    PUZZLE_BACKGROUND,
+    PUZZLE_INK,
+    PUZZLE_MARGIN,
+    PUZZLE_SQUARE_SIZE,
+    background_layer,
+    load_font,
+)
+from overlays import arrow_mask, composite, highlight_mask, moves_bitboards
+from sprites import sprite_atlas
+
+PIECE_UNICODE = {
+    'K': '♔', 'Q': '♕', 'R': '♖', 'B': '♗', 'N': '♘', 'P': '♙',
+    'k': '♚', 'q': '♛', 'r': '♜', 'b': '♝', 'n': '♞', 'p': '♟'
+}
+
+# === PUZZLE BOARD (Puzzles_2) ===
+def render_puzzle_board(board, move_arrows=None, suggested_moves=None, square_size=PUZZLE_SQUARE_SIZE):
+    """Draw the puzzle board with move arrows and suggested-move outlines"""
+    margin = PUZZLE_MARGIN
+    img = background_layer("puzzle", square_size).copy()
+    draw = ImageDraw.Draw(img)
+
+    # Highlight suggested moves
+    if suggested_moves:
+        to_bb, from_bb = moves_bitboards(suggested_moves)
+        composite(img, PUZZLE_INK, highlight_mask(to_bb, square_size), (margin, margin))
+        composite(img, PUZZLE_BACKGROUND, highlight_mask(from_bb, square_size), (margin, margin))
+
+    # Draw pieces
+    for square, piece in board.piece_map().items():
+        x = margin + chess.square_file(square) * square_size
+        y = margin + (7 - chess.square_rank(square)) * square_size
+
+        sprite = sprite_atlas.sprite(piece.symbol(), square_size - 6)
+        if sprite:
+            piece_img, mask = sprite
+            img.paste(piece_img, (x + 3, y + 3), mask)
+        else:
+            symbol = PIECE_UNICODE.get(piece.symbol(), piece.symbol())
+            draw.text((x + square_size//2 - 6, y + square_size//2 - 6),
+                     symbol, fill=PUZZLE_INK, font=load_font(12))
+
+    # Draw move arrows
+    if move_arrows:
+        composite(img, PUZZLE_INK, arrow_mask(move_arrows, img.width, square_size, margin))
+
+    return img
+
+
+# === GAME BOARD (chess_app_3) ===
+GAME_BOARD_SIZE = 8 * GAME_SQUARE_SIZE
+GAME_TOTAL_SIZE = GAME_BOARD_SIZE + GAME_MARGIN
+
+
+def game_square_origin(square):
+    """Top-left pixel of a square on the game board"""
+    row = 7 - (square // 8)
+    col = square % 8
+    return GAME_MARGIN + col * GAME_SQUARE_SIZE, row * GAME_SQUARE_SIZE
+
+
+def game_square_region(square):
+    """Pixel box a square can affect.
+
+    Squares and highlights are drawn with inclusive rectangles, so they spill
+    one pixel into the right and bottom neighbours.
+    """
+    x, y = game_square_origin(square)
+    return (
+        x,
+        y,
+        min(x + GAME_SQUARE_SIZE + 1, GAME_TOTAL_SIZE),
+        min(y + GAME_SQUARE_SIZE + 1, GAME_TOTAL_SIZE),
+    )
+
+
+def last_move_squares(board):
+    if not board.move_stack:
+        return ()
+    last_move = board.move_stack[-1]
+    return (last_move.from_square, last_move.to_square)
+
+
+def paint_game_region(frame, box, background, piece_map, highlights):
+    """Repaint one pixel box of frame exactly as a full redraw would.
+
+    The box is rebuilt from the background, then every highlight and piece
+    that overlaps it is drawn in the same order as the full renderer.
+    """
+    left, top, right, bottom = box
+    tile = background.crop(box)
+    draw = ImageDraw.Draw(tile)
+
+    for square in highlights:
+        x, y = game_square_origin(square)
+        if x > right or y > bottom or x + GAME_SQUARE_SIZE < left or y + GAME_SQUARE_SIZE < top:
+            continue
+        draw.rectangle([x - left, y - top, x - left + GAME_SQUARE_SIZE, y - top + GAME_SQUARE_SIZE],
+                       outline=GAME_HIGHLIGHT, width=4)
+
+    for square, piece in piece_map.items():
+        x, y = game_square_origin(square)
+        if x >= right or y >= bottom or x + GAME_SQUARE_SIZE <= left or y + GAME_SQUARE_SIZE <= top:
+            continue
+        sprite = sprite_atlas.sprite(piece.symbol(), GAME_SQUARE_SIZE)
+        if sprite:
+            piece_img, mask = sprite
+            tile.paste(piece_img, (x - left, y - top), mask)
+
+    frame.paste(tile, (left, top))
+
+
+def render_game_board(board, last_move=None):
+    """Full redraw of the chess_app_3 board.
+
+    The last move is highlighted; it is taken from the move stack unless given.
+    """
+    if last_move is not None:
+        highlights = (last_move.from_square, last_move.to_square)
+    else:
+        highlights = last_move_squares(board)
+    background = background_layer("game", GAME_SQUARE_SIZE)
+    frame = background.copy()
+    paint_game_region(frame, (0, 0, GAME_TOTAL_SIZE, GAME_TOTAL_SIZE), background,
+                      board.piece_map(), highlights)
+    return frame
+
+
+class IncrementalBoardRenderer:
+    """Keeps the last frame of one session and repaints only changed squares.
+
+    A square is dirty when its piece changed or when it gains or loses the
+    last-move highlight. Each dirty square is repainted with
+    paint_game_region, so the result is pixel-identical to a full redraw.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.piece_map = {}
+        self.highlights = ()
+        self.last_dirty = 64
+
+    def render(self, board):
+        piece_map = board.piece_map()
+        highlights = last_move_squares(board)
+
+        if self.frame is None:
+            self.frame = render_game_board(board)
+            self.last_dirty = 64
+        else:
+            background = background_layer("game", GAME_SQUARE_SIZE)
+            dirty = set(self.highlights) | set(highlights)
+            for square in set(self.piece_map) | set(piece_map):
+                if self.piece_map.get(square) != piece_map.get(square):
+                    dirty.add(square)
+            for square in dirty:
+                paint_game_region(self.frame, game_square_region(square), background,
+                                  piece_map, highlights)
+            self.last_dirty = len(dirty)
+
+        self.piece_map = piece_map
+        self.highlights = highlights
+        # Hand out a copy: returned images may live on in the render cache.
+        return self.frame.copy()
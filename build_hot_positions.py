@@ -0,0 +1,136 @@
+"""Precompute engine analyses of the most frequent early positions (hot_positions.json.gz).
+
+Usage:
+    python build_hot_positions.py --out hot_positions.json.gz
+    python build_hot_positions.py --out hot.json.gz --positions 2000 --max-ply 8 --depth 22 --workers 4
+
+Positions are ranked by how often games reach them: starting from the initial
+position, each move's share of play (from the move statistics index, or the
+Polyglot book's weights) is multiplied down the tree, and the --positions
+most likely positions within --max-ply plies are kept. Each is analysed with
+Stockfish at --depth and --multipv, and the lines are written with their SAN
+labels in the analysis_cache encoding that hot_positions.HotPositions loads.
+"""
+import argparse
+import concurrent.futures
+import gzip
+import heapq
+import itertools
+import json
+import sys
+import time
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from analysis_cache import encode_infos
+from engine_pool import DEFAULT_POOL_SIZE, STOCKFISH_PATH, EnginePool
+from move_stats import MOVE_STATS_PATH, get_move_stats
+from opening_book import OPENING_BOOK_PATH, get_opening_book
+
+DEFAULT_POSITIONS = 1000
+DEFAULT_MAX_PLY = 8
+DEFAULT_DEPTH = 22
+DEFAULT_MULTIPV = 3
+
+
+def move_shares(board, move_stats, book):
+    """(move, share of play) for board from the games index, else from the book"""
+    if move_stats:
+        moves = move_stats.lookup(board)
+        total = sum(move["white"] + move["draws"] + move["black"] for move in moves)
+        if total:
+            return [(chess.Move.from_uci(move["uci"]), (move["white"] + move["draws"] + move["black"]) / total)
+                    for move in moves]
+    if book:
+        return [(candidate.move, candidate.share) for candidate in book.candidates(board)]
+    return []
+
+
+def hot_positions(move_stats, book, limit=DEFAULT_POSITIONS, max_ply=DEFAULT_MAX_PLY):
+    """The limit most frequent positions within max_ply plies, most frequent first, as (frequency, board)"""
+    counter = itertools.count()  # tie-breaker so boards are never compared
+    frontier = [(-1.0, next(counter), chess.Board())]
+    seen = set()
+    found = []
+    while frontier and len(found) < limit:
+        negative_frequency, _, board = heapq.heappop(frontier)
+        key = chess.polyglot.zobrist_hash(board)
+        if key in seen:
+            continue
+        seen.add(key)
+        found.append((-negative_frequency, board))
+        if board.ply() >= max_ply:
+            continue
+        for move, share in move_shares(board, move_stats, book):
+            child = board.copy(stack=False)
+            child.push(move)
+            heapq.heappush(frontier, (negative_frequency * share, next(counter), child))
+    return found
+
+
+def analyse_position(pool, board, depth, multipv):
+    with pool.lease() as engine:
+        infos = engine.analyse(board, chess.engine.Limit(depth=depth), multipv=multipv)
+    return {
+        "fen": board.fen(),
+        "san": [board.san(info["pv"][0]) for info in infos if info.get("pv")],
+        "infos": encode_infos(infos),
+    }
+
+
+def build_table(positions, out_path, engine_path=STOCKFISH_PATH, depth=DEFAULT_DEPTH, multipv=DEFAULT_MULTIPV,
+                workers=DEFAULT_POOL_SIZE, progress=None):
+    """Analyse (frequency, board) pairs and write the table; returns a summary dict"""
+    pool = EnginePool(engine_path, size=workers)
+    table = {}
+    start = time.perf_counter()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(analyse_position, pool, board, depth, multipv): board
+                       for _, board in positions}
+            for future in concurrent.futures.as_completed(futures):
+                table[f"{chess.polyglot.zobrist_hash(futures[future]):016x}"] = future.result()
+                if progress:
+                    progress(len(table), len(futures), time.perf_counter() - start)
+    finally:
+        pool.close()
+
+    with gzip.open(out_path, "wt", encoding="utf-8") as f:
+        json.dump({"depth": depth, "multipv": multipv, "positions": table}, f, separators=(",", ":"))
+    elapsed = time.perf_counter() - start
+    return {"positions": len(table), "seconds": elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute analyses of the most frequent early positions.")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--positions", type=int, default=DEFAULT_POSITIONS)
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY)
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--multipv", type=int, default=DEFAULT_MULTIPV)
+    parser.add_argument("--workers", type=int, default=DEFAULT_POOL_SIZE, help="Stockfish processes")
+    parser.add_argument("--engine", default=STOCKFISH_PATH)
+    parser.add_argument("--move-stats", default=MOVE_STATS_PATH, help="index from build_move_stats.py")
+    parser.add_argument("--book", default=OPENING_BOOK_PATH, help="Polyglot book, used without a move index")
+    args = parser.parse_args(argv)
+
+    move_stats, book = get_move_stats(args.move_stats), get_opening_book(args.book)
+    if not move_stats and not book:
+        parser.error("need a move statistics index or an opening book to rank positions")
+    positions = hot_positions(move_stats, book, args.positions, args.max_ply)
+    print(f"Analysing {len(positions)} positions "
+          f"(the rarest is reached in {positions[-1][0]:.2%} of games)", file=sys.stderr)
+
+    def progress(done, total, elapsed):
+        print(f"\r{done}/{total} positions, {done / elapsed if elapsed else 0.0:.1f} positions/s",
+              end="", file=sys.stderr)
+
+    summary = build_table(positions, args.out, args.engine, args.depth, args.multipv, args.workers, progress)
+    print(file=sys.stderr)
+    print(f"Wrote {summary['positions']} positions to {args.out} in {summary['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
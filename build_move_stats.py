@@ -0,0 +1,239 @@
+"""Build the move statistics index (move_stats.idx) from PGN files.
+
+Usage:
+    python build_move_stats.py games.pgn --out move_stats.idx
+    python build_move_stats.py a.pgn b.pgn --out move_stats.idx --max-ply 20 --min-games 5 --workers 8
+
+PGN files are streamed: games are split off the input a chunk at a time and
+parsed across a process pool, so input size does not affect memory. Each
+worker counts results per (position, move) for the first --max-ply plies of
+every finished game. The parent merges the counts and spills them to sorted
+run files whenever --spill-entries is reached, then merges the runs into one
+index sorted by Zobrist key that move_stats.MoveStats memory-maps. At most
+--merge-fan-in runs are open at once; more are merged in rounds through
+intermediate runs, so large inputs stay within the open-file limit.
+"""
+import argparse
+import collections
+import heapq
+import io
+import itertools
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+from move_stats import encode_move, read_records, write_records
+
+DEFAULT_MAX_PLY = 16
+DEFAULT_MIN_GAMES = 1
+DEFAULT_CHUNK_SIZE = 256  # games per worker task
+# Each in-memory count (key tuple plus a three-int list in a dict) takes about 260 bytes,
+# so the default keeps the parent around 50 MB before a run is spilled.
+DEFAULT_SPILL_ENTRIES = 200_000
+# Run files open at once while merging, well under the usual 1024 descriptor limit.
+DEFAULT_MERGE_FAN_IN = 64
+RESULT_COLUMNS = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+
+def split_games(lines):
+    """Yield the text of each game in a PGN stream"""
+    game = []
+    in_movetext = False
+    for line in lines:
+        if line.startswith("[") and in_movetext:
+            yield "".join(game)
+            game = []
+            in_movetext = False
+        if line.strip() and not line.startswith("["):
+            in_movetext = True
+        game.append(line)
+    if in_movetext:
+        yield "".join(game)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def count_games(task):
+    """Worker: tally (key, move) -> [white, draws, black] over a chunk of game texts"""
+    texts, max_ply = task
+    counts = collections.defaultdict(lambda: [0, 0, 0])
+    games = skipped = 0
+    for text in texts:
+        try:
+            game = chess.pgn.read_game(io.StringIO(text))
+        except (ValueError, IndexError):
+            game = None
+        column = RESULT_COLUMNS.get(game.headers.get("Result")) if game else None
+        if column is None or game.errors:
+            skipped += 1
+            continue
+        board = game.board()
+        for move in itertools.islice(game.mainline_moves(), max_ply):
+            counts[(chess.polyglot.zobrist_hash(board), encode_move(move))][column] += 1
+            board.push(move)
+        games += 1
+    return dict(counts), games, skipped
+
+
+def spill(counts, directory):
+    """Write counts as a sorted run file and return its path"""
+    handle = tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".run", delete=False)
+    with handle:
+        write_records(handle, (key + tuple(values) for key, values in sorted(counts.items())))
+    return handle.name
+
+
+def merge_files(paths, out, min_games=0):
+    """Merge sorted run files into the open file out, adding up equal (key, move) records"""
+    handles = [open(path, "rb") for path in paths]
+    try:
+        merged = heapq.merge(*(read_records(handle) for handle in handles))
+
+        def combined():
+            for key, group in itertools.groupby(merged, key=lambda record: record[:2]):
+                totals = [sum(column) for column in zip(*(record[2:] for record in group))]
+                if sum(totals) >= min_games:
+                    yield key + tuple(totals)
+
+        return write_records(out, combined())
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def merge_runs(paths, out_path, min_games=DEFAULT_MIN_GAMES, fan_in=DEFAULT_MERGE_FAN_IN):
+    """Merge sorted run files into the final index, never opening more than fan_in runs at once.
+
+    Intermediate runs are written next to the inputs and removed once merged;
+    min_games is only applied in the last round, when the totals are complete.
+    """
+    paths = list(paths)
+    fan_in = max(2, fan_in)
+    intermediate = set()
+    while len(paths) > fan_in:
+        merged = []
+        for start in range(0, len(paths), fan_in):
+            group = paths[start:start + fan_in]
+            if len(group) == 1:
+                merged.extend(group)
+                continue
+            handle = tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(group[0]), suffix=".run", delete=False)
+            with handle:
+                merge_files(group, handle)
+            for path in intermediate.intersection(group):
+                os.unlink(path)
+            intermediate.add(handle.name)
+            merged.append(handle.name)
+        paths = merged
+    try:
+        with open(out_path, "wb") as out:
+            return merge_files(paths, out, min_games)
+    finally:
+        for path in intermediate.intersection(paths):
+            os.unlink(path)
+
+
+def build_index(sources, out_path, max_ply=DEFAULT_MAX_PLY, min_games=DEFAULT_MIN_GAMES, workers=None,
+                chunk_size=DEFAULT_CHUNK_SIZE, spill_entries=DEFAULT_SPILL_ENTRIES, progress=None,
+                merge_fan_in=DEFAULT_MERGE_FAN_IN):
+    """Build a move statistics index from an iterable of PGN line streams.
+
+    progress(games, skipped, elapsed) is called after every chunk. Returns a
+    summary dict including games per second.
+    """
+    games = skipped = 0
+    counts = collections.defaultdict(lambda: [0, 0, 0])
+    runs = []
+    start = time.perf_counter()
+    texts = itertools.chain.from_iterable(split_games(source) for source in sources)
+    tasks = ((chunk, max_ply) for chunk in chunked(texts, chunk_size))
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_path))) as scratch:
+        def absorb(result):
+            nonlocal games, skipped
+            chunk_counts, chunk_games, chunk_skipped = result
+            for key, values in chunk_counts.items():
+                totals = counts[key]
+                for column, value in enumerate(values):
+                    totals[column] += value
+            games += chunk_games
+            skipped += chunk_skipped
+            if len(counts) >= spill_entries:
+                runs.append(spill(counts, scratch))
+                counts.clear()
+            if progress:
+                progress(games, skipped, time.perf_counter() - start)
+
+        with multiprocessing.Pool(workers) as pool:
+            # Pool.imap would read the whole input ahead; keep only a few chunks in flight instead.
+            pending = collections.deque()
+            window = 2 * (workers or os.cpu_count() or 1)
+            for task in tasks:
+                pending.append(pool.apply_async(count_games, (task,)))
+                if len(pending) >= window:
+                    absorb(pending.popleft().get())
+            while pending:
+                absorb(pending.popleft().get())
+        if counts or not runs:
+            runs.append(spill(counts, scratch))
+        entries = merge_runs(runs, out_path, min_games, merge_fan_in)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "games": games,
+        "skipped": skipped,
+        "entries": entries,
+        "runs": len(runs),
+        "seconds": elapsed,
+        "games_per_second": games / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the move statistics index from PGN files.")
+    parser.add_argument("inputs", nargs="+", help="PGN files ('-' for stdin)")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY)
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES,
+                        help="drop moves played in fewer games than this")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--spill-entries", type=int, default=DEFAULT_SPILL_ENTRIES,
+                        help="counts held in memory before spilling a sorted run to disk")
+    parser.add_argument("--merge-fan-in", type=int, default=DEFAULT_MERGE_FAN_IN,
+                        help="run files merged at once")
+    args = parser.parse_args(argv)
+
+    def progress(games, skipped, elapsed):
+        rate = games / elapsed if elapsed else 0.0
+        print(f"\r{games} games, {skipped} skipped, {rate:.0f} games/s", end="", file=sys.stderr)
+
+    def sources():
+        for path in args.inputs:
+            if path == "-":
+                yield sys.stdin
+            else:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    yield f
+
+    summary = build_index(sources(), args.out, args.max_ply, args.min_games, args.workers,
+                          args.chunk_size, args.spill_entries, progress, args.merge_fan_in)
+    print(file=sys.stderr)
+    print(f"Indexed {summary['games']} games into {summary['entries']} moves in {summary['seconds']:.1f}s "
+          f"({summary['games_per_second']:.0f} games/s, {summary['skipped']} skipped, {summary['runs']} runs)")
+
+
+if __name__ == "__main__":
+    main()
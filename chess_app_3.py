@@ -3,7 +3,7 @@ import sys
 import os
 import threading
 import time
-import requests
+import uuid
 
 if sys.platform.startswith('win'):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
@@ -12,11 +12,36 @@ import streamlit as st
 import chess
 import chess.engine
 import pyttsx3
-from PIL import Image, ImageDraw, ImageFont
+
+from analysis_cache import analysis_cache
+from async_engine import POLL_INTERVAL, cancel_jobs, engine_job, get_async_engine, jobs_pending
+from board_render import GAME_SQUARE_SIZE, IncrementalBoardRenderer
+from engine_pool import STOCKFISH_PATH, get_engine_pool
+from engine_scheduler import HINT, EngineOverloaded
+from explorer_client import get_explorer_client
+from hot_positions import get_hot_positions
+from image_encoding import encode_image
+from move_stats import get_move_stats
+from opening_book import get_opening_book
+from prefetch import prefetcher
+from render_cache import board_key, render_cache
+from render_service import get_render_service, render_encoded
+from search_control import AnalysisStream, SearchProfile, get_search_controller
+from sprites import sprite_atlas
+from utils import get_basic_ai_move
 
 # Parameters
 STOCKFISH_TIME_LIMIT = 0.1
-COMPUTER_MOVE_DELAY = 0.2
+# Hints share one multipv search per position with the computer move and analysis panel.
+HINT_SEARCH = SearchProfile(max_depth=20, budget=STOCKFISH_TIME_LIMIT)
+COMPUTER_SEARCH = SearchProfile(max_depth=20, budget=0.5)  # adapts to load, see search_control
+ANALYSIS_SEARCH = SearchProfile(max_depth=30, budget=1.0)
+FALLBACK_NOTICE = "⚡ Engines are busy, so these suggestions come from the quick built-in AI"
+SUGGESTION_TIMEOUT = 8.0  # give up on Stockfish + Lichess suggestions after this many seconds
+BOOK_SUGGESTIONS = 2  # opening database/book moves added after the engine's best move
+USE_REMOTE_EXPLORER = False  # also ask the Lichess explorer (LICHESS_EXPLORER_URL), often blocked on school networks
+BOARD_IMAGE_ENCODING = "png-palette"  # "png-palette", "webp-lossless" or "png-fast"
+RENDER_WORKERS = 0  # > 0 renders boards in a shared process pool
 
 # Page Config
 st.set_page_config(page_title="Adaptive Chess Learning", page_icon="♟", layout="centered")
@@ -240,16 +265,17 @@ section[data-testid="stSidebar"] * {
 if "board" not in st.session_state:
     st.session_state.board = chess.Board()
 
+if "board_renderer" not in st.session_state:
+    st.session_state.board_renderer = IncrementalBoardRenderer()
+
 if "tts_engine" not in st.session_state:
     st.session_state.tts_engine = pyttsx3.init()
     st.session_state.speaking_lock = threading.Lock()
 
-if "stockfish" not in st.session_state:
-    stockfish_path = r"C:\\Users\\omote\\Desktop\\stockfish\\stockfish.exe"
-    if not os.path.exists(stockfish_path):
-        st.error(f"Stockfish not found at {stockfish_path}")
-        st.stop()
-    st.session_state.stockfish = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+# Engines are shared by every session through a bounded pool
+if not os.path.exists(STOCKFISH_PATH):
+    st.error(f"Stockfish not found at {STOCKFISH_PATH}")
+    st.stop()
 
 if "game_message" not in st.session_state:
     st.session_state.game_message = ""
@@ -273,95 +299,39 @@ if "game_stats" not in st.session_state:
 if "computer_should_play" not in st.session_state:
     st.session_state.computer_should_play = False
 
+# Identifies this session to the engine scheduler, which shares engines fairly between sessions
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Background engine searches: name -> (future, fen the search was started for)
+if "engine_jobs" not in st.session_state:
+    st.session_state.engine_jobs = {}
+
 board = st.session_state.board
 tts_engine = st.session_state.tts_engine
 speaking_lock = st.session_state.speaking_lock
-stockfish = st.session_state.stockfish
+stockfish_pool = get_engine_pool(STOCKFISH_PATH)
+async_engine = get_async_engine(stockfish_pool)
+search_controller = get_search_controller(async_engine)
+# Precomputed analyses of the early positions every game passes through (build_hot_positions.py)
+hot_positions = get_hot_positions()
 
 @st.cache_resource
 def load_piece_images():
-    pieces = {}
-    colors = ['w', 'b']
-    types = ['p', 'r', 'n', 'b', 'q', 'k']
-    for color in colors:
-        for t in types:
-            path = f'assets/{color}{t}.png'
-            if os.path.exists(path):
-                pieces[color + t] = Image.open(path).resize((64, 64), Image.Resampling.LANCZOS)
-            else:
-                st.error(f"Missing piece image: {path}")
-                st.stop()
-    return pieces
+    missing = sprite_atlas.missing()
+    if missing:
+        st.error(f"Missing piece image: {missing[0]}")
+        st.stop()
+    sprite_atlas.preload()
+    return sprite_atlas
 
 piece_images = load_piece_images()
 
 def draw_board(board):
-    SQUARE_SIZE = 64
-    BOARD_SIZE = 8 * SQUARE_SIZE
-    MARGIN = 50
-    TOTAL_SIZE = BOARD_SIZE + MARGIN
-    light_color = (240, 217, 181)
-    dark_color = (181, 136, 99)
-    background_color = (2, 102, 112)
-    
-    try:
-        font = ImageFont.truetype("arial.ttf", 24)
-    except IOError:
-        font = ImageFont.load_default()
-    
-    img = Image.new('RGB', (TOTAL_SIZE, TOTAL_SIZE), background_color)
-    draw = ImageDraw.Draw(img)
-    
-    # Draw squares
-    for row in range(8):
-        for col in range(8):
-            square_color = light_color if (row + col) % 2 == 0 else dark_color
-            x1 = MARGIN + col * SQUARE_SIZE
-            y1 = row * SQUARE_SIZE
-            draw.rectangle([x1, y1, x1 + SQUARE_SIZE, y1 + SQUARE_SIZE], fill=square_color)
-    
-    # Highlight last move if available
-    if board.move_stack:
-        last_move = board.move_stack[-1]
-        from_square = last_move.from_square
-        to_square = last_move.to_square
-        
-        for square in [from_square, to_square]:
-            row = 7 - (square // 8)
-            col = square % 8
-            x1 = MARGIN + col * SQUARE_SIZE
-            y1 = row * SQUARE_SIZE
-            # Highlight with a colored border
-            draw.rectangle([x1, y1, x1 + SQUARE_SIZE, y1 + SQUARE_SIZE], 
-                         outline=(255, 255, 0), width=4)
-    
-    # Draw pieces
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            row = 7 - (square // 8)
-            col = square % 8
-            key = ('w' if piece.color == chess.WHITE else 'b') + piece.symbol().lower()
-            piece_img = piece_images.get(key)
-            if piece_img:
-                x = MARGIN + col * SQUARE_SIZE
-                y = row * SQUARE_SIZE
-                img.paste(piece_img, (x, y), piece_img.convert("RGBA"))
-    
-    # Draw coordinates
-    columns = 'abcdefgh'
-    for idx, char in enumerate(columns):
-        x = MARGIN + idx * SQUARE_SIZE + SQUARE_SIZE // 2
-        y = BOARD_SIZE + 5
-        draw.text((x - 8, y), char, fill="white", font=font)
-    
-    for idx in range(8):
-        row_number = str(8 - idx)
-        x = 10
-        y = idx * SQUARE_SIZE + SQUARE_SIZE // 2 - 12
-        draw.text((x, y), row_number, fill="white", font=font)
-    
-    return img
+    last_move = board.move_stack[-1] if board.move_stack else None
+    key = board_key(board, "game", GAME_SQUARE_SIZE, last_move=last_move, encoding=BOARD_IMAGE_ENCODING)
+    render_local = lambda: encode_image(st.session_state.board_renderer.render(board), BOARD_IMAGE_ENCODING)
+    return render_cache.get_or_render(key, lambda: render_encoded(key, render_local, RENDER_WORKERS))
 
 def speak_message_async(message, rate=150):
     def speak_worker(msg):
@@ -371,31 +341,49 @@ def speak_message_async(message, rate=150):
             tts_engine.runAndWait()
     threading.Thread(target=speak_worker, args=(message,), daemon=True).start()
 
-def get_best_moves(board, count=3):
-    """Get the best moves from both Stockfish and Lichess database"""
+def compute_suggestions(board, stockfish_search, count=3):
+    """Get the best moves from Stockfish and the local opening database (runs in a prefetch thread)"""
     moves = []
+    engine_moves = []
     
-    # Get Stockfish suggestion
+    # Get Stockfish suggestions (one line per multipv), or the built-in AI's move while the engines are busy
     try:
-        stockfish_move = stockfish.play(board, chess.engine.Limit(time=STOCKFISH_TIME_LIMIT))
-        if stockfish_move and stockfish_move.move:
-            moves.append(stockfish_move.move.uci())
+        if stockfish_search is None:
+            engine_moves.append(get_basic_ai_move(board).uci())
+        else:
+            for info in stockfish_search.result():
+                if info.get("pv"):
+                    engine_moves.append(info["pv"][0].uci())
+    except EngineOverloaded:
+        engine_moves.append(get_basic_ai_move(board).uci())
     except Exception as e:
-        st.warning(f"Stockfish error: {e}")
+        pass  # Database and legal moves still give suggestions
+    moves.extend(engine_moves[:1])
     
-    # Get Lichess opening database suggestions
-    try:
-        fen = board.fen()
-        url = f"https://explorer.lichess.ovh/lichess?variant=standard&fen={fen}"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        lichess_moves = data.get("moves", [])
+    # Get opening suggestions: most played moves from our own games index, else the Polyglot book
+    database_moves = []
+    move_stats = get_move_stats()
+    if move_stats:
+        database_moves = [move_data["uci"] for move_data in move_stats.lookup(board, BOOK_SUGGESTIONS + 1)]
+    book = get_opening_book()
+    if book and not database_moves:
+        database_moves = book.moves(board, BOOK_SUGGESTIONS + 1)
+    for move_uci in database_moves:
+        if move_uci not in moves and len(moves) < 1 + BOOK_SUGGESTIONS:
+            moves.append(move_uci)
+    
+    # Get Lichess opening database suggestions (only when enabled); empty if not back in time
+    if USE_REMOTE_EXPLORER:
+        lichess_moves = get_explorer_client().moves(board.fen())
         for move_data in lichess_moves[:2]:  # Get top 2 from database
             move_uci = move_data['uci']
             if move_uci not in moves:
                 moves.append(move_uci)
-    except Exception as e:
-        pass  # Silently fail for lichess API
+    
+    # Fill up with the engine's other lines, then with legal moves
+    for move_uci in engine_moves[1:]:
+        if len(moves) < count and move_uci not in moves:
+            moves.append(move_uci)
     
     # Ensure we have at least some moves by getting random legal moves if needed
     if len(moves) < count:
@@ -408,6 +396,48 @@ def get_best_moves(board, count=3):
     
     return moves[:count]
 
+def start_suggestions(board, count=3):
+    """Compute suggestions for board in the background and return their future"""
+    board = board.copy()
+    jobs = st.session_state.engine_jobs
+    if USE_REMOTE_EXPLORER:
+        # Runs alongside the engine search; as a job it keeps the page polling until it lands
+        engine_job(jobs, "explorer", board.fen(), lambda: get_explorer_client().watch(board.fen()))
+    search = engine_job(jobs, "hint_search", board.fen(), lambda: search_controller.search(
+        board, HINT_SEARCH, multipv=count, interactive=False, priority=HINT, session=st.session_state.session_id))
+    return prefetcher.submit(compute_suggestions, board, search, count, cancel=[search], timeout=SUGGESTION_TIMEOUT)
+
+def start_quick_suggestions(board, count=3):
+    """Suggestions without Stockfish, for while the engines are overloaded"""
+    return prefetcher.submit(compute_suggestions, board.copy(), None, count, timeout=SUGGESTION_TIMEOUT)
+
+def get_best_moves(board, count=3):
+    """Suggested moves for board; None while they are still being computed"""
+    hot_moves = hot_positions.moves(board, count) if hot_positions else None
+    if hot_moves:
+        return hot_moves
+    jobs = st.session_state.engine_jobs
+    fen = board.fen()
+    hint, quick = jobs.get("hint"), jobs.get("quick_hint")
+    if (quick and quick[1] == fen) or (not (hint and hint[1] == fen) and async_engine.scheduler.overloaded()):
+        st.caption(FALLBACK_NOTICE)
+        future = engine_job(jobs, "quick_hint", fen, lambda: start_quick_suggestions(board, count))
+    else:
+        future = engine_job(jobs, "hint", fen, lambda: start_suggestions(board, count))
+        explorer, search = jobs.get("explorer"), jobs.get("hint_search")
+        if future.done() and explorer and explorer[1] == fen and explorer[0].done() and search and search[1] == fen:
+            # The explorer may have answered after the suggestions were ranked without it:
+            # rank them once more, from the finished search and the now cached answer
+            future = engine_job(jobs, "explorer_hint", fen, lambda: prefetcher.submit(
+                compute_suggestions, board.copy(), search[0], count, timeout=SUGGESTION_TIMEOUT))
+    if not future.done():
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        st.warning(f"Suggestions unavailable: {e}")
+        return [move.uci() for move in list(board.legal_moves)[:count]]
+
 def check_game_state():
     if board.is_checkmate():
         winner = "Black" if board.turn == chess.WHITE else "White"
@@ -427,17 +457,23 @@ def check_game_state():
         st.session_state.game_message = ""
 
 def play_computer_move():
-    """Function to handle computer moves"""
+    """Start the computer's search, and play its move once the search has finished"""
+    start = lambda: search_controller.search(board, COMPUTER_SEARCH, session=st.session_state.session_id)
+    future = engine_job(st.session_state.engine_jobs, "computer", board.fen(), start)
+    if not future.done():
+        return False
+    del st.session_state.engine_jobs["computer"]
     try:
-        computer_move = stockfish.play(board, chess.engine.Limit(time=0.5))
-        if computer_move and computer_move.move:
+        computer_pv = future.result().get("pv")
+        if computer_pv:
+            computer_move = computer_pv[0]
             # Get the SAN before pushing the move
-            comp_move_san = board.san(computer_move.move)
+            comp_move_san = board.san(computer_move)
             
-            if board.is_capture(computer_move.move):
+            if board.is_capture(computer_move):
                 st.session_state.game_stats["captures"] += 1
             
-            board.push(computer_move.move)
+            board.push(computer_move)
             
             # Add computer move to history (Black's move)
             if st.session_state.move_history:
@@ -446,13 +482,21 @@ def play_computer_move():
                 st.session_state.move_history.append(f"1... {comp_move_san}")
             
             st.session_state.game_stats["moves_played"] += 1
-            st.success(f"🤖 Computer played {computer_move.move.uci()} ({comp_move_san})")
+            st.success(f"🤖 Computer played {computer_move.uci()} ({comp_move_san})")
             speak_message_async(f"Computer plays {comp_move_san}")
             check_game_state()
             
+            # Start on the student's suggestions while the move is being announced
+            if not board.is_game_over() and not async_engine.scheduler.overloaded() and not (
+                    hot_positions and hot_positions.lookup(board)):
+                engine_job(st.session_state.engine_jobs, "hint", board.fen(), lambda: start_suggestions(board))
+            
             # Reset the flag
             st.session_state.computer_should_play = False
             return True
+    except EngineOverloaded:
+        # Dropped while queued behind an overload; search again, the reruns pick it up
+        engine_job(st.session_state.engine_jobs, "computer", board.fen(), start)
     except Exception as e:
         st.error(f"Computer move error: {e}")
         st.session_state.computer_should_play = False
@@ -515,11 +559,26 @@ if st.session_state.get("debug_mode", False):
     st.write(f"Debug: auto_play = {st.session_state.auto_play}")
     st.write(f"Debug: board.turn = {'BLACK' if board.turn == chess.BLACK else 'WHITE'}")
     st.write(f"Debug: game_over = {board.is_game_over()}")
+    st.write(f"Debug: render cache = {render_cache.stats()}")
+    st.write(f"Debug: engine pool = {stockfish_pool.stats()}")
+    st.write(f"Debug: analysis cache = {analysis_cache.stats()}")
+    st.write(f"Debug: search control = {search_controller.stats()}")
+    st.write(f"Debug: engine scheduler = {async_engine.scheduler.stats()}")
+    st.write(f"Debug: prefetch = {prefetcher.stats()}")
+    st.write(f"Debug: opening book = {get_opening_book().stats() if get_opening_book() else None}")
+    st.write(f"Debug: move stats = {get_move_stats().stats() if get_move_stats() else None}")
+    st.write(f"Debug: hot positions = {hot_positions.stats() if hot_positions else None}")
+    if USE_REMOTE_EXPLORER:
+        st.write(f"Debug: explorer = {get_explorer_client().stats()}")
+    st.write(f"Debug: engine jobs = {sorted(st.session_state.engine_jobs)}")
+    st.write(f"Debug: squares repainted last frame = {st.session_state.board_renderer.last_dirty}")
+    if get_render_service(RENDER_WORKERS):
+        st.write(f"Debug: render service = {get_render_service(RENDER_WORKERS).stats()}")
 
 # FIXED: Check if computer should play at the start of each render
-if st.session_state.computer_should_play and st.session_state.auto_play and board.turn == chess.BLACK and not board.is_game_over():
+computer_to_move = (st.session_state.computer_should_play and st.session_state.auto_play) or "computer" in st.session_state.engine_jobs
+if computer_to_move and board.turn == chess.BLACK and not board.is_game_over():
     st.info("🤖 Computer is thinking...")
-    time.sleep(COMPUTER_MOVE_DELAY)
     if play_computer_move():
         st.rerun()
 
@@ -548,13 +607,16 @@ if board.turn == chess.WHITE and not board.is_game_over():
     st.subheader("💡 Suggested Moves:")
     suggestions = get_best_moves(board, 3)
     
-    if suggestions:
+    if suggestions is None:
+        st.info("💭 Thinking of suggestions...")
+    elif suggestions:
         col1, col2, col3 = st.columns(3)
+        labels = hot_positions.labels(board) if hot_positions else {}
         
         for i, move_uci in enumerate(suggestions):
             try:
                 move = chess.Move.from_uci(move_uci)
-                move_san = board.san(move)
+                move_san = labels.get(move_uci) or board.san(move)
                 
                 with [col1, col2, col3][i]:
                     if st.button(f"🎯 {move_uci}\n({move_san})", key=f"suggest_{i}"):
@@ -630,6 +692,7 @@ with st.sidebar:
             st.session_state.game_stats["moves_played"] = max(0, st.session_state.game_stats["moves_played"] - 1)
             # Reset computer play flag
             st.session_state.computer_should_play = False
+            cancel_jobs(st.session_state.engine_jobs)
             st.info(f"⏪ Move {last_move.uci()} undone.")
             speak_message_async(f"Move {last_move.uci()} undone.")
             st.rerun()
@@ -643,6 +706,7 @@ with st.sidebar:
         st.session_state.game_stats = {"moves_played": 0, "captures": 0, "checks": 0}
         st.session_state.game_message = ""
         st.session_state.computer_should_play = False  # Reset flag
+        cancel_jobs(st.session_state.engine_jobs)
         st.info("🆕 Game reset.")
         speak_message_async("Game reset.")
         st.rerun()
@@ -663,8 +727,18 @@ with st.sidebar:
     
     # Game analysis
     if st.button("🔍 Position Analysis"):
+        hot = hot_positions.lookup(board) if hot_positions else None
+        engine_job(st.session_state.engine_jobs, "analysis", board.fen(), lambda: AnalysisStream.finished(hot) if hot else search_controller.search(board, ANALYSIS_SEARCH, interactive=False, session=st.session_state.session_id))
+    analysis = st.session_state.engine_jobs.get("analysis")
+    if analysis and analysis[1] == board.fen() and not analysis[0].done() and analysis[0].latest() is None:
+        st.info("🔍 Analysing position...")
+    elif analysis and analysis[1] == board.fen():
+        # The evaluation is shown from the first completed depth and refines while the search runs
+        stream = analysis[0]
         try:
-            info = stockfish.analyse(board, chess.engine.Limit(time=1.0))
+            info = stream.result() if stream.done() else stream.latest()
+            if not stream.done():
+                st.caption(f"🔍 Searching deeper... (depth {stream.depth})")
             score = info["score"].relative
             if score.is_mate():
                 st.info(f"🏁 Mate in {score.mate()} moves")
@@ -676,11 +750,16 @@ with st.sidebar:
                     st.info(f"📉 Black is better by {abs(cp_score):.2f}")
                 else:
                     st.info("⚖️ Position is equal")
+        except EngineOverloaded:
+            st.warning("⏳ The engines are busy right now, try the analysis again in a moment")
         except Exception as e:
             st.warning("Unable to analyze position")
+        if stream.done():
+            # Shown once, like the evaluation the button used to print
+            del st.session_state.engine_jobs["analysis"]
 
     if st.button("🚪 Quit"):
-        stockfish.quit()
+        # The engine pool is shared with other sessions, so it is left running
         st.stop()
 
     st.markdown("---")
@@ -690,4 +769,10 @@ with st.sidebar:
         <em>Adaptive Chess Learning</em><br>
         <small>Enhanced with AI assistance</small>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+# === BACKGROUND ENGINE WORK ===
+# Searches run on the engine pool; rerun shortly to pick up their results.
+if jobs_pending(st.session_state.engine_jobs, board.fen()):
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
\ No newline at end of file
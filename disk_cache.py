@@ -0,0 +1,133 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+# Per-user, so other accounts on the machine cannot plant images in it.
+DEFAULT_CACHE_DIR = os.environ.get(
+    "CHESS_RENDER_CACHE_DIR",
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                 "chess_render_cache"),
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Eviction trims the store to this fraction of max_bytes so it does not run on every write.
+LOW_WATER = 0.8
+
+
+class DiskCache:
+    """File-backed key -> bytes store shared by every process using the same directory.
+
+    Each entry is one file named after a hash of the key. Writes go to a
+    temporary file that is atomically renamed into place, so readers in
+    other processes never see a partial entry. Reads refresh the file's
+    mtime, and eviction removes the oldest files first.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def path_for(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".bin")
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError:
+            self.errors += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self.path_for(key)
+        folder = os.path.dirname(path)
+        try:
+            os.makedirs(folder, mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            self.errors += 1
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self.scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        """(mtime, size, path) for every stored entry"""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def scan_size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the store is under the low-water mark.
+
+        Other processes may evict at the same time; files that are already
+        gone are simply skipped.
+        """
+        entries = sorted(self.entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * LOW_WATER
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
@@ -0,0 +1,217 @@
+import collections
+import concurrent.futures
+import contextlib
+import os
+import threading
+import time
+
+import chess.engine
+
+STOCKFISH_PATH = os.environ.get("STOCKFISH_PATH", r"C:\Users\omote\Desktop\stockfish\stockfish.exe")
+DEFAULT_POOL_SIZE = int(os.environ.get("STOCKFISH_POOL_SIZE", "2"))
+DEFAULT_THREADS = 1
+DEFAULT_HASH_MB = 32
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+
+def engine_is_alive(engine):
+    """Whether the engine process is still running; commands on one that died raise EngineTerminatedError"""
+    return not engine.returncode.done()
+
+
+class EnginePool:
+    """A bounded set of Stockfish processes shared by every session.
+
+    Engines are started lazily up to size, handed out with request()/checkout()
+    and returned with checkin(). A crashed engine is discarded and replaced on
+    the next request, and engines left idle longer than idle_timeout are shut
+    down by a background reaper.
+    """
+
+    def __init__(self, path=STOCKFISH_PATH, size=DEFAULT_POOL_SIZE, threads=DEFAULT_THREADS,
+                 hash_mb=DEFAULT_HASH_MB, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.options = {"Threads": threads, "Hash": hash_mb}
+        self.idle_timeout = idle_timeout
+        self._idle = []  # (engine, last_used)
+        self._total = 0  # idle + busy + starting
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.started = 0
+        self.restarted = 0
+        self.reaped = 0
+        self._reaper = threading.Thread(target=self._reap_loop, name="engine-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    # === CHECKOUT / CHECKIN ===
+    def request(self):
+        """Future resolving to an engine as soon as one is free"""
+        future = concurrent.futures.Future()
+        spawn = False
+        with self._lock:
+            if self._closed:
+                future.set_exception(RuntimeError("Engine pool is closed"))
+                return future
+            while self._idle:
+                engine, _ = self._idle.pop()
+                if engine_is_alive(engine):
+                    future.set_result(engine)
+                    return future
+                self._discard(engine)
+            if self._total < self.size:
+                self._total += 1
+                spawn = True
+            else:
+                self._waiters.append(future)
+        if spawn:
+            threading.Thread(target=self._spawn, args=(future,), daemon=True).start()
+        return future
+
+    def checkout(self, timeout=None):
+        """Block until an engine is free and return it"""
+        future = self.request()
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            if not future.cancel():
+                # Lost the race: the engine arrived just as we gave up.
+                self.checkin(future.result())
+            raise
+
+    def checkin(self, engine, broken=False):
+        """Return an engine to the pool; broken engines are closed and replaced on demand"""
+        if broken or not engine_is_alive(engine):
+            with self._lock:
+                self._discard(engine)
+                self.restarted += 1
+                respawn = self._next_waiter_needs_engine()
+            if respawn:
+                threading.Thread(target=self._spawn, args=(respawn,), daemon=True).start()
+            return
+
+        with self._lock:
+            if self._closed:
+                self._total -= 1
+            else:
+                while self._waiters:
+                    waiter = self._waiters.popleft()
+                    if waiter.set_running_or_notify_cancel():
+                        waiter.set_result(engine)
+                        return
+                self._idle.append((engine, time.monotonic()))
+                return
+        self._close_engine(engine)
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """with pool.lease() as engine: ... -- crashed engines are replaced automatically"""
+        engine = self.checkout(timeout)
+        broken = False
+        try:
+            yield engine
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError):
+            broken = True
+            raise
+        finally:
+            self.checkin(engine, broken=broken)
+
+    # === INTERNALS ===
+    def _spawn(self, future):
+        if not future.set_running_or_notify_cancel():
+            with self._lock:
+                self._total -= 1
+            return
+        try:
+            engine = chess.engine.SimpleEngine.popen_uci(self.path)
+            self._configure(engine)
+        except Exception as e:
+            with self._lock:
+                self._total -= 1
+            future.set_exception(e)
+            return
+        with self._lock:
+            self.started += 1
+        future.set_result(engine)
+
+    def _configure(self, engine):
+        options = {name: value for name, value in self.options.items() if name in engine.options}
+        if options:
+            engine.configure(options)
+
+    def _discard(self, engine):
+        """Drop an engine from the pool's count; caller holds the lock"""
+        self._total -= 1
+        threading.Thread(target=self._close_engine, args=(engine,), daemon=True).start()
+
+    def _next_waiter_needs_engine(self):
+        """After a discard, pop a waiter to receive a freshly spawned engine; caller holds the lock"""
+        if self._closed or not self._waiters or self._total >= self.size:
+            return None
+        self._total += 1
+        return self._waiters.popleft()
+
+    @staticmethod
+    def _close_engine(engine):
+        try:
+            engine.quit()
+        except Exception:
+            engine.close()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 2))
+            if self._closed:
+                return
+            self.reap_idle()
+
+    def reap_idle(self):
+        """Shut down engines that have been idle longer than idle_timeout"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            stale = [engine for engine, last_used in self._idle if last_used < cutoff]
+            self._idle = [(engine, last_used) for engine, last_used in self._idle if last_used >= cutoff]
+            self._total -= len(stale)
+            self.reaped += len(stale)
+        for engine in stale:
+            self._close_engine(engine)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle = [engine for engine, _ in self._idle]
+            self._total -= len(idle)
+            self._idle = []
+            waiters, self._waiters = list(self._waiters), collections.deque()
+        for waiter in waiters:
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_exception(RuntimeError("Engine pool is closed"))
+        for engine in idle:
+            self._close_engine(engine)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "running": self._total,
+                "idle": len(self._idle),
+                "busy": self._total - len(self._idle),
+                "waiting": len(self._waiters),
+                "started": self.started,
+                "restarted": self.restarted,
+                "reaped": self.reaped,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_engine_pool(path=STOCKFISH_PATH, size=DEFAULT_POOL_SIZE):
+    """Process-wide pool for an engine binary, shared by every page and session"""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = EnginePool(path, size)
+        return pool
@@ -0,0 +1,231 @@
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+# Lower runs first.
+INTERACTIVE = 0  # computer replies a student is waiting on
+HINT = 1
+BACKGROUND = 2  # position analysis, speculation and prefetch
+PRIORITY_NAMES = {INTERACTIVE: "interactive", HINT: "hint", BACKGROUND: "background"}
+
+# Most engine jobs one session may hold at once; the rest wait in the queue.
+SESSION_JOB_LIMIT = 2
+WAIT_WINDOW = 200
+
+# === ADMISSION CONTROL ===
+# Work at SHED_PRIORITY or below is refused while the engines are overloaded:
+# when jobs have been queueing longer than SHED_WAIT seconds, or the load
+# average per CPU is above SHED_CPU. Service resumes once both are back
+# under RECOVERY_FRACTION of their thresholds and SHED_HOLD seconds have
+# passed since the last overload (shedding itself empties the queue).
+SHED_PRIORITY = HINT
+SHED_WAIT = 2.0
+SHED_CPU = 0.9
+RECOVERY_FRACTION = 0.5
+SHED_HOLD = 5.0
+# Only waits from the last few seconds count towards overload.
+WAIT_HORIZON = 10.0
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class EngineOverloaded(RuntimeError):
+    pass
+
+
+def cpu_load():
+    """1-minute load average per CPU, or 0.0 where the platform has none (Windows)"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 0.0
+
+
+class Ticket:
+    """A queued request for an engine"""
+
+    def __init__(self, priority, session):
+        self.priority = priority
+        self.session = session
+        self.future = concurrent.futures.Future()
+        self.queued = time.monotonic()
+
+
+class EngineScheduler:
+    """Priority queue in front of an EnginePool.
+
+    request() takes the place of pool.request(): engines go to interactive
+    work before hints and hints before background analysis. Within a priority,
+    sessions take turns, and no session holds more than session_limit engines
+    at once. Jobs are only handed to the pool while it has a free engine, so a
+    queue of background analyses never sits ahead of a student's move.
+
+    While overloaded (see overloaded()) requests at shed_priority or below
+    fail at once with EngineOverloaded, and queued background work is
+    dropped, so pages fall back to cheaper answers instead of waiting.
+    """
+
+    def __init__(self, pool, session_limit=SESSION_JOB_LIMIT, shed_priority=SHED_PRIORITY,
+                 shed_wait=SHED_WAIT, shed_cpu=SHED_CPU):
+        self.pool = pool
+        self.session_limit = session_limit
+        self.shed_priority = shed_priority
+        self.shed_wait = shed_wait
+        self.shed_cpu = shed_cpu
+        self.shedding = False
+        self._shed_until = 0.0
+        self.shed = 0
+        self.overloads = 0
+        self._queues = {priority: collections.OrderedDict() for priority in PRIORITY_NAMES}  # session -> deque
+        self._in_flight = 0
+        self._sessions = collections.Counter()  # session -> engines held
+        self._owners = {}  # id(engine) -> session
+        self._waits = {priority: collections.deque(maxlen=WAIT_WINDOW) for priority in PRIORITY_NAMES}
+        self._recent_waits = collections.deque(maxlen=WAIT_WINDOW)  # (finished, wait)
+        self._dispatched = collections.Counter()
+        self._lock = threading.Lock()
+
+    def request(self, priority=BACKGROUND, session=None):
+        """Future resolving to an engine once the job's turn comes"""
+        ticket = Ticket(priority, session)
+        if priority >= self.shed_priority and self.overloaded():
+            with self._lock:
+                self.shed += 1
+            ticket.future.set_exception(EngineOverloaded("Engines are busy"))
+            return ticket.future
+        with self._lock:
+            self._queues[priority].setdefault(session, collections.deque()).append(ticket)
+        self._dispatch()
+        return ticket.future
+
+    def overloaded(self):
+        """Whether low-priority work is being shed; re-evaluated on every call"""
+        cpu = cpu_load()
+        dropped = []
+        with self._lock:
+            now = time.monotonic()
+            wait = self._queue_pressure()
+            if wait > self.shed_wait or cpu > self.shed_cpu:
+                self._shed_until = now + SHED_HOLD
+                if not self.shedding:
+                    self.shedding = True
+                    self.overloads += 1
+                    dropped = self._drop_queued(BACKGROUND)
+            elif (self.shedding and now >= self._shed_until and wait < self.shed_wait * RECOVERY_FRACTION
+                  and cpu < self.shed_cpu * RECOVERY_FRACTION):
+                self.shedding = False
+            shedding = self.shedding
+        for ticket in dropped:
+            if ticket.future.set_running_or_notify_cancel():
+                ticket.future.set_exception(EngineOverloaded("Engines are busy"))
+        return shedding
+
+    def checkin(self, engine, broken=False):
+        with self._lock:
+            self._release(self._owners.pop(id(engine), None))
+        self.pool.checkin(engine, broken=broken)
+        self._dispatch()
+
+    # === INTERNALS ===
+    def _queue_pressure(self):
+        """Longest recent wait for an engine, including jobs still queued; caller holds the lock"""
+        now = time.monotonic()
+        waits = [wait for finished, wait in self._recent_waits if now - finished < WAIT_HORIZON]
+        for sessions in self._queues.values():
+            for queue in sessions.values():
+                waits.extend(now - ticket.queued for ticket in queue if not ticket.future.cancelled())
+        return max(waits, default=0.0)
+
+    def _drop_queued(self, lowest):
+        """Remove and return every queued ticket at priority lowest or below; caller holds the lock"""
+        dropped = []
+        for priority, sessions in self._queues.items():
+            if priority >= lowest:
+                for queue in sessions.values():
+                    dropped.extend(queue)
+                sessions.clear()
+        self.shed += len(dropped)
+        return dropped
+
+    def _release(self, session):
+        """Free a dispatch slot; caller holds the lock"""
+        self._in_flight -= 1
+        self._sessions[session] -= 1
+        if self._sessions[session] <= 0:
+            del self._sessions[session]
+
+    def _next_ticket(self):
+        """Pop the next runnable ticket, skipping cancelled ones; caller holds the lock"""
+        for priority, sessions in self._queues.items():
+            for session in list(sessions):
+                queue = sessions[session]
+                while queue and queue[0].future.cancelled():
+                    queue.popleft()
+                if not queue:
+                    del sessions[session]
+                    continue
+                if self._sessions[session] >= self.session_limit:
+                    continue
+                ticket = queue.popleft()
+                # Round-robin: this session goes to the back of its priority.
+                if queue:
+                    sessions.move_to_end(session)
+                else:
+                    del sessions[session]
+                return ticket
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._in_flight >= self.pool.size:
+                    return
+                ticket = self._next_ticket()
+                if ticket is None:
+                    return
+                if not ticket.future.set_running_or_notify_cancel():
+                    continue
+                self._in_flight += 1
+                self._sessions[ticket.session] += 1
+            lease = self.pool.request()
+            lease.add_done_callback(lambda lease, ticket=ticket: self._on_engine(ticket, lease))
+
+    def _on_engine(self, ticket, lease):
+        if lease.exception() is not None:
+            with self._lock:
+                self._release(ticket.session)
+            ticket.future.set_exception(lease.exception())
+            self._dispatch()
+            return
+        engine = lease.result()
+        with self._lock:
+            self._owners[id(engine)] = ticket.session
+            self._waits[ticket.priority].append(time.monotonic() - ticket.queued)
+            self._recent_waits.append((time.monotonic(), time.monotonic() - ticket.queued))
+            self._dispatched[ticket.priority] += 1
+        ticket.future.set_result(engine)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "in_flight": self._in_flight,
+                "sessions": len(self._sessions),
+                "shedding": self.shedding,
+                "overloads": self.overloads,
+                "shed": self.shed,
+                "queue_pressure": self._queue_pressure(),
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                stats[f"{name}_queued"] = sum(
+                    1 for queue in self._queues[priority].values() for ticket in queue if not ticket.future.cancelled())
+                stats[f"{name}_dispatched"] = self._dispatched[priority]
+                stats[f"{name}_wait_p50"] = percentile(self._waits[priority], 0.5)
+                stats[f"{name}_wait_p99"] = percentile(self._waits[priority], 0.99)
+            return stats
@@ -0,0 +1,127 @@
+import concurrent.futures
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+EXPLORER_URL = os.environ.get("LICHESS_EXPLORER_URL", "https://explorer.lichess.ovh/lichess")
+EXPLORER_TTL = 3600.0
+# Failures are remembered briefly so a blocked endpoint is not retried on every rerun.
+EXPLORER_ERROR_TTL = 30.0
+EXPLORER_CACHE_SIZE = 2048
+EXPLORER_TIMEOUT = 5.0  # per HTTP request, in the background
+EXPLORER_DEADLINE = 0.3  # longest a caller waits for an answer
+EXPLORER_WORKERS = 4
+
+
+class ExplorerClient:
+    """Opening explorer lookups over one pooled keep-alive session.
+
+    Responses are cached by FEN with a TTL, least recently used first out.
+    Requests for a FEN already being fetched share that fetch. moves() waits
+    at most the deadline and returns an empty list if the answer is not in
+    yet; the fetch carries on in the background and a later call finds it
+    cached.
+    """
+
+    def __init__(self, base_url=EXPLORER_URL, ttl=EXPLORER_TTL, max_entries=EXPLORER_CACHE_SIZE,
+                 timeout=EXPLORER_TIMEOUT, workers=EXPLORER_WORKERS):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="explorer")
+        self._cache = OrderedDict()  # fen -> (expires, moves)
+        self._in_flight = {}  # fen -> Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.coalesced = 0
+        self.requests = 0
+        self.errors = 0
+
+    def fetch(self, fen):
+        """Future of the explorer's "moves" list for fen, from the cache when possible"""
+        with self._lock:
+            entry = self._cache.get(fen)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(fen)
+                self.hits += 1
+                future = concurrent.futures.Future()
+                future.set_result(entry[1])
+                return future
+            future = self._in_flight.get(fen)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            self.requests += 1
+            future = self._in_flight[fen] = self._executor.submit(self._request, fen)
+        future.add_done_callback(lambda future: self._store(fen, future))
+        return future
+
+    def watch(self, fen):
+        """Future of fen's moves ([] on failure) that the caller may cancel without affecting the shared fetch"""
+        watcher = concurrent.futures.Future()
+
+        def forward(future):
+            try:
+                watcher.set_result([] if future.exception() is not None else future.result())
+            except concurrent.futures.InvalidStateError:
+                pass  # the watcher was cancelled
+
+        self.fetch(fen).add_done_callback(forward)
+        return watcher
+
+    def moves(self, fen, deadline=EXPLORER_DEADLINE):
+        """The explorer's moves for fen, or [] if they are not available within the deadline"""
+        try:
+            return self.fetch(fen).result(timeout=deadline)
+        except (concurrent.futures.TimeoutError, requests.RequestException, ValueError):
+            return []
+
+    def _request(self, fen):
+        response = self.session.get(self.base_url, params={"variant": "standard", "fen": fen}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get("moves", [])
+
+    def _store(self, fen, future):
+        failed = future.exception() is not None
+        with self._lock:
+            self._in_flight.pop(fen, None)
+            if failed:
+                self.errors += 1
+            ttl = EXPLORER_ERROR_TTL if failed else self.ttl
+            self._cache[fen] = (time.monotonic() + ttl, [] if failed else future.result())
+            self._cache.move_to_end(fen)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                "cached": len(self._cache),
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "requests": self.requests,
+                "errors": self.errors,
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_explorer_client(base_url=EXPLORER_URL):
+    """Process-wide ExplorerClient for an explorer endpoint, shared by every session"""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = ExplorerClient(base_url)
+        return client
@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+import threading
+
+import chess
+import chess.polyglot
+
+from analysis_cache import decode_infos, from_side_to_move
+
+# Engine analyses of the most frequent early positions, built by build_hot_positions.py.
+HOT_POSITIONS_PATH = os.environ.get("CHESS_HOT_POSITIONS",
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), "hot_positions.json.gz"))
+
+
+class HotPositions:
+    """Precomputed multipv analyses of the opening positions every game passes through.
+
+    The file maps Zobrist keys (hex) to analysis_cache-encoded infos plus the
+    SAN of each line's first move; it is read once at startup and each entry
+    is decoded on first use.
+    """
+
+    def __init__(self, path=HOT_POSITIONS_PATH):
+        self.path = path
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        self.depth = data.get("depth")
+        self._entries = {int(key, 16): entry for key, entry in data["positions"].items()}
+        self._decoded = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, board):
+        """InfoDicts (one per multipv line, best first) for board, or None if it is not a hot position"""
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        infos = self._decoded.get(key)
+        if infos is None:
+            infos = self._decoded[key] = from_side_to_move(decode_infos(entry["infos"]), board)
+        return infos
+
+    def moves(self, board, count=None):
+        """UCI strings of the precomputed best moves, or None if board is not a hot position"""
+        infos = self.lookup(board)
+        if infos is None:
+            return None
+        return [info["pv"][0].uci() for info in infos if info.get("pv")][:count]
+
+    def labels(self, board):
+        """uci -> SAN for the precomputed best moves of board"""
+        entry = self._entries.get(chess.polyglot.zobrist_hash(board))
+        if entry is None:
+            return {}
+        return {info["pv"][0].uci(): san for info, san in zip(self.lookup(board), entry["san"])}
+
+    def stats(self):
+        return {"path": self.path, "positions": len(self), "depth": self.depth,
+                "hits": self.hits, "misses": self.misses}
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_hot_positions(path=HOT_POSITIONS_PATH):
+    """Shared HotPositions for path, or None when the file is missing or unreadable"""
+    with _tables_lock:
+        if path not in _tables:
+            try:
+                _tables[path] = HotPositions(path)
+            except (OSError, ValueError, KeyError):
+                _tables[path] = None
+        return _tables[path]
@@ -0,0 +1,31 @@
+import io
+
+from PIL import Image, features
+
+# A board has a few dozen flat colours plus anti-aliased piece edges, so a
+# 256-colour palette PNG is a fraction of the size of a full RGB PNG.
+PNG_PALETTE = "png-palette"
+WEBP_LOSSLESS = "webp-lossless"
+PNG_FAST = "png-fast"
+ENCODINGS = (PNG_PALETTE, WEBP_LOSSLESS, PNG_FAST)
+DEFAULT_ENCODING = PNG_PALETTE
+
+
+def encode_image(img, encoding=DEFAULT_ENCODING):
+    """Encode a PIL image to bytes that st.image can display as-is"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown image encoding: {encoding}")
+    if encoding == WEBP_LOSSLESS and not features.check("webp"):
+        encoding = PNG_PALETTE
+
+    buffer = io.BytesIO()
+    if encoding == PNG_PALETTE:
+        palette_img = img.convert("RGB").quantize(
+            colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+        )
+        palette_img.save(buffer, format="PNG")
+    elif encoding == WEBP_LOSSLESS:
+        img.save(buffer, format="WEBP", lossless=True, quality=50, method=2)
+    else:
+        img.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,122 @@
+import mmap
+import os
+import struct
+import threading
+
+import chess
+import chess.polyglot
+
+# Index of per-position move statistics built from PGN files by build_move_stats.py.
+MOVE_STATS_PATH = os.environ.get("CHESS_MOVE_STATS",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "move_stats.idx"))
+
+MAGIC = b"MVSTATS1"
+# Zobrist key, move (to | from << 6 | promotion << 12), white wins, draws, black wins.
+RECORD = struct.Struct(">QHIII")
+
+
+def encode_move(move):
+    return move.to_square | move.from_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(raw):
+    return chess.Move(raw >> 6 & 0x3F, raw & 0x3F, raw >> 12 or None)
+
+
+def read_records(handle):
+    """Yield (key, move, white, draws, black) tuples from an index or spill file, in file order"""
+    if handle.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a move statistics file")
+    while True:
+        chunk = handle.read(RECORD.size)
+        if len(chunk) < RECORD.size:
+            return
+        yield RECORD.unpack(chunk)
+
+
+def write_records(handle, records):
+    handle.write(MAGIC)
+    written = 0
+    for record in records:
+        handle.write(RECORD.pack(*record))
+        written += 1
+    return written
+
+
+class MoveStats:
+    """Read-only, memory-mapped move statistics index.
+
+    Records are sorted by (position key, move), so the moves of a position
+    are found with a binary search and read straight from the mapping.
+    lookup() answers in the shape of the Lichess explorer's "moves" list.
+    """
+
+    def __init__(self, path=MOVE_STATS_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a move statistics file")
+        self._size = (len(self._mmap) - len(MAGIC)) // RECORD.size
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self._size
+
+    def _record(self, index):
+        return RECORD.unpack_from(self._mmap, len(MAGIC) + index * RECORD.size)
+
+    def _bisect(self, key):
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key):
+        """(move, white, draws, black) for every move stored under a Zobrist key"""
+        index = self._bisect(key)
+        while index < self._size:
+            record = self._record(index)
+            if record[0] != key:
+                break
+            yield (decode_move(record[1]),) + record[2:]
+            index += 1
+
+    def lookup(self, board, count=None):
+        """Explorer-style move dicts (uci, san, white, draws, black) for board, most played first"""
+        moves = []
+        for move, white, draws, black in self.entries(chess.polyglot.zobrist_hash(board)):
+            if board.is_legal(move):
+                moves.append({"uci": move.uci(), "san": board.san(move), "white": white, "draws": draws, "black": black})
+        moves.sort(key=lambda move: move["white"] + move["draws"] + move["black"], reverse=True)
+        self.lookups += 1
+        if moves:
+            self.hits += 1
+        return moves[:count]
+
+    def close(self):
+        self._mmap.close()
+
+    def stats(self):
+        return {"path": self.path, "entries": len(self), "lookups": self.lookups, "hits": self.hits}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_move_stats(path=MOVE_STATS_PATH):
+    """Shared MoveStats for path, or None when the index is missing or unreadable"""
+    with _indexes_lock:
+        if path not in _indexes:
+            try:
+                _indexes[path] = MoveStats(path)
+            except (OSError, ValueError):
+                _indexes[path] = None
+        return _indexes[path]
@@ -0,0 +1,72 @@
+import collections
+import os
+import threading
+
+import chess.polyglot
+
+# Polyglot .bin book; suggestions come from it before any engine or network lookup.
+OPENING_BOOK_PATH = os.environ.get("CHESS_OPENING_BOOK",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin"))
+
+BookMove = collections.namedtuple("BookMove", "move weight share")
+
+
+class OpeningBook:
+    """Read-only Polyglot opening book.
+
+    The file is memory-mapped and its entries are sorted by Zobrist key, so a
+    lookup is a binary search touching a handful of pages; nothing is loaded
+    up front and the OS shares the mapping between sessions.
+    """
+
+    def __init__(self, path=OPENING_BOOK_PATH):
+        self.path = path
+        self._reader = chess.polyglot.open_reader(path)
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._reader)
+
+    def candidates(self, board, count=None, minimum_weight=1):
+        """Legal book moves for board, heaviest first, each with its share of the position's total weight"""
+        weights = collections.Counter()
+        for entry in self._reader.find_all(board, minimum_weight=minimum_weight):
+            weights[entry.move] += entry.weight
+        self.lookups += 1
+        if weights:
+            self.hits += 1
+        total = sum(weights.values())
+        return [BookMove(move, weight, weight / total) for move, weight in weights.most_common(count)]
+
+    def moves(self, board, count=None):
+        """UCI strings of the heaviest book moves"""
+        return [candidate.move.uci() for candidate in self.candidates(board, count)]
+
+    def choice(self, board):
+        """A book move drawn in proportion to its weight, or None when out of book"""
+        try:
+            return self._reader.weighted_choice(board).move
+        except IndexError:
+            return None
+
+    def close(self):
+        self._reader.close()
+
+    def stats(self):
+        return {"path": self.path, "entries": len(self), "lookups": self.lookups, "hits": self.hits}
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def get_opening_book(path=OPENING_BOOK_PATH):
+    """Shared OpeningBook for path, or None when the file is missing or unreadable"""
+    with _books_lock:
+        if path not in _books:
+            try:
+                _books[path] = OpeningBook(path)
+            except (OSError, ValueError):
+                _books[path] = None
+        return _books[path]
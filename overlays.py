@@ -0,0 +1,90 @@
+import functools
+
+import chess
+import numpy as np
+from PIL import Image, ImageDraw
+
+ARROWHEAD_LENGTH = 8
+ARROWHEAD_ANGLE = np.pi / 6
+
+
+def moves_bitboards(moves):
+    """Bitboards of the destination and origin squares of a list of moves.
+
+    A square that is both an origin and a destination counts as a destination.
+    """
+    to_bb = 0
+    from_bb = 0
+    for move in moves or ():
+        to_bb |= chess.BB_SQUARES[move.to_square]
+        from_bb |= chess.BB_SQUARES[move.from_square]
+    return to_bb, from_bb & ~to_bb
+
+
+def bitboard_grid(bitboard):
+    """8x8 uint8 grid of a bitboard in image order (rank 8 in the top row)"""
+    bits = np.unpackbits(np.array([bitboard], dtype=">u8").view(np.uint8))
+    return bits[::-1].reshape(8, 8)[::-1]
+
+
+@functools.lru_cache(maxsize=None)
+def outline_tile(square_size, inset=2, width=2):
+    """One square's outline as a uint8 alpha tile"""
+    tile = Image.new("L", (square_size, square_size), 0)
+    ImageDraw.Draw(tile).rectangle(
+        [inset, inset, square_size - inset, square_size - inset], outline=255, width=width
+    )
+    return np.asarray(tile)
+
+
+@functools.lru_cache(maxsize=None)
+def square_centers(square_size, margin):
+    """Pixel centres of all 64 squares, indexed by square number"""
+    squares = np.arange(64)
+    files = squares % 8
+    ranks = squares // 8
+    cx = margin + files * square_size + square_size // 2
+    cy = margin + (7 - ranks) * square_size + square_size // 2
+    return cx, cy
+
+
+def highlight_mask(bitboard, square_size, opacity=1.0, inset=2, width=2):
+    """Alpha mask covering the whole 8x8 board with an outline on every set square"""
+    tile = outline_tile(square_size, inset, width)
+    if opacity < 1.0:
+        tile = (tile * opacity).astype(np.uint8)
+    mask = np.kron(bitboard_grid(bitboard), tile)
+    return Image.fromarray(mask, "L")
+
+
+def arrow_mask(moves, image_size, square_size, margin, width=3, opacity=1.0):
+    """Alpha mask with one arrow per move, computed for all arrows at once"""
+    mask = Image.new("L", (image_size, image_size), 0)
+    if not moves:
+        return mask
+
+    cx, cy = square_centers(square_size, margin)
+    from_squares = np.array([move.from_square for move in moves])
+    to_squares = np.array([move.to_square for move in moves])
+    start_x, start_y = cx[from_squares], cy[from_squares]
+    end_x, end_y = cx[to_squares], cy[to_squares]
+
+    angle = np.arctan2(end_y - start_y, end_x - start_x)
+    x1 = end_x - ARROWHEAD_LENGTH * np.cos(angle - ARROWHEAD_ANGLE)
+    y1 = end_y - ARROWHEAD_LENGTH * np.sin(angle - ARROWHEAD_ANGLE)
+    x2 = end_x - ARROWHEAD_LENGTH * np.cos(angle + ARROWHEAD_ANGLE)
+    y2 = end_y - ARROWHEAD_LENGTH * np.sin(angle + ARROWHEAD_ANGLE)
+
+    value = int(255 * opacity)
+    draw = ImageDraw.Draw(mask)
+    for i in range(len(moves)):
+        end = (int(end_x[i]), int(end_y[i]))
+        draw.line([(int(start_x[i]), int(start_y[i])), end], fill=value, width=width)
+        draw.polygon([end, (x1[i], y1[i]), (x2[i], y2[i])], fill=value)
+    return mask
+
+
+def composite(img, color, mask, origin=(0, 0)):
+    """Alpha-blend a solid colour onto img through mask, in place"""
+    left, top = origin
+    img.paste(color, (left, top, left + mask.width, top + mask.height), mask)
@@ -0,0 +1,76 @@
+import concurrent.futures
+import threading
+
+from async_engine import transfer_outcome
+
+PREFETCH_WORKERS = 4
+PREFETCH_TIMEOUT = 10.0
+
+
+class PrefetchTimeout(TimeoutError):
+    pass
+
+
+class Prefetcher:
+    """Runs speculative work in a small thread pool so a later rerun can pick up the result.
+
+    submit() returns a future that fails with PrefetchTimeout once the timeout
+    passes. Cancelling it, or timing out, also cancels the futures it was
+    given in ``cancel`` (typically the engine searches the work is waiting on).
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS, timeout=PREFETCH_TIMEOUT):
+        self.timeout = timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.timed_out = 0
+
+    def submit(self, fn, *args, cancel=(), timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        result = concurrent.futures.Future()
+        work = self._executor.submit(fn, *args)
+        timer = threading.Timer(timeout, self._expire, args=(result, timeout))
+        timer.daemon = True
+
+        def on_result_done(result):
+            timer.cancel()
+            if result.cancelled() or result.exception() is not None:
+                work.cancel()
+                for future in cancel:
+                    future.cancel()
+            with self._lock:
+                if result.cancelled():
+                    self.cancelled += 1
+                elif isinstance(result.exception(), PrefetchTimeout):
+                    self.timed_out += 1
+                else:
+                    self.completed += 1
+
+        with self._lock:
+            self.submitted += 1
+        result.add_done_callback(on_result_done)
+        work.add_done_callback(lambda work: transfer_outcome(work, result))
+        timer.start()
+        return result
+
+    @staticmethod
+    def _expire(result, timeout):
+        try:
+            result.set_exception(PrefetchTimeout(f"Prefetch did not finish within {timeout:.1f}s"))
+        except concurrent.futures.InvalidStateError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "timed_out": self.timed_out,
+            }
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,89 @@
+import functools
+import random
+
+import chess
+import numpy as np
+
+SQUARES = np.arange(64)
+
+
+def _attack_table(piece_type):
+    """ATTACKS[from, to]: whether a piece_type on from attacks to on an empty board"""
+    table = np.zeros((64, 64), dtype=bool)
+    for square in chess.SQUARES:
+        board = chess.Board(None)
+        board.set_piece_at(square, chess.Piece(piece_type, chess.WHITE))
+        for target in board.attacks(square):
+            table[square, target] = True
+    return table
+
+
+ATTACKS = {piece_type: _attack_table(piece_type) for piece_type in
+           (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN)}
+# BETWEEN[a, b, square]: whether square lies strictly between a and b on a rank, file or diagonal.
+BETWEEN = np.array([[[bool(chess.between(a, b) & chess.BB_SQUARES[square]) for square in chess.SQUARES]
+                     for b in chess.SQUARES] for a in chess.SQUARES])
+# KING_ZONE[k, square]: square is k itself or next to it.
+KING_ZONE = np.array([[chess.square_distance(k, square) <= 1 for square in chess.SQUARES] for k in chess.SQUARES])
+LIGHT_SQUARES = np.array([bool(chess.BB_LIGHT_SQUARES & chess.BB_SQUARES[square]) for square in chess.SQUARES])
+
+
+def _completions(white_type, black_type, white_king, black_king=SQUARES[:, None, None],
+                 white=SQUARES[None, :, None], black=SQUARES[None, None, :]):
+    """valid[black_king, white_piece, black_piece] for positions with White to move and the white king on white_king
+
+    Pass squares (or arrays of them) to evaluate only part of the table.
+    """
+    valid = ((black_king != white) & (black_king != black) & (white != black)
+             & (white != white_king) & (black != white_king))
+    valid &= ~KING_ZONE[white_king, black_king]
+    # Black is not to move, so its king must not be in check (the kings can't give check, being apart).
+    blocked = BETWEEN[white, black_king, white_king] | BETWEEN[white, black_king, black]
+    valid &= ~(ATTACKS[white_type][white, black_king] & ~blocked)
+    if white_type == black_type == chess.BISHOP:
+        # Same-coloured bishops are a dead draw.
+        valid &= LIGHT_SQUARES[white] != LIGHT_SQUARES[black]
+    return valid
+
+
+@functools.lru_cache(maxsize=None)
+def placement_table(white_type, black_type):
+    """Cumulative count of valid placements over (white king, black king, white piece), 1 MB per piece set"""
+    counts = [_completions(white_type, black_type, white_king).sum(axis=2) for white_king in chess.SQUARES]
+    return np.cumsum(np.stack(counts).ravel(), dtype=np.int32)
+
+
+def draw_placement(white_type, black_type, rng=random):
+    """(white king, black king, white piece, black piece) squares, uniform over the valid placements
+
+    Only the black piece's squares are evaluated per draw; the table picks the rest.
+    """
+    cumulative = placement_table(white_type, black_type)
+    index = rng.randrange(int(cumulative[-1]))
+    row = int(np.searchsorted(cumulative, index, side="right"))
+    offset = index - (int(cumulative[row - 1]) if row else 0)
+    white_king, black_king, white = row // 4096, row // 64 % 64, row % 64
+    black = int(np.flatnonzero(_completions(white_type, black_type, white_king, black_king, white, SQUARES))[offset])
+    return white_king, black_king, white, black
+
+
+def random_puzzle_board(white_symbol, black_symbol, rng=random):
+    """A random legal, unfinished position of K + white_symbol against k + black_symbol, White to move.
+
+    Every placement in the tables is legal; the few where White is already
+    mated or stalemated are redrawn, which keeps the draw uniform.
+    """
+    white_type = chess.Piece.from_symbol(white_symbol).piece_type
+    black_type = chess.Piece.from_symbol(black_symbol).piece_type
+    if {white_type, black_type} & {chess.KING, chess.PAWN}:
+        raise ValueError(f"Unsupported piece set {white_symbol}/{black_symbol}: pieces must be N, B, R or Q")
+    while True:
+        white_king, black_king, white, black = draw_placement(white_type, black_type, rng)
+        board = chess.Board(None)
+        board.set_piece_at(white_king, chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(black_king, chess.Piece(chess.KING, chess.BLACK))
+        board.set_piece_at(white, chess.Piece(white_type, chess.WHITE))
+        board.set_piece_at(black, chess.Piece(black_type, chess.BLACK))
+        board.turn = chess.WHITE
+        if not board.is_game_over():
+            return board
@@ -0,0 +1,143 @@
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+from board_layers import render_signature
+from disk_cache import DEFAULT_CACHE_DIR, DiskCache
+
+# Every page imports this module, so one cache is shared by all
+# Streamlit sessions running in the same server process.
+DEFAULT_MAX_ENTRIES = 256
+# Directory names render_signature() produces, e.g. "v1-DejaVuSans.ttf".
+SIGNATURE_DIR = re.compile(r"v\d+-.+")
+
+
+def move_keys(moves):
+    """Turn an iterable of chess.Move objects into a hashable tuple of UCI strings"""
+    if not moves:
+        return ()
+    return tuple(move.uci() for move in moves)
+
+
+def board_key(board, theme, square_size, last_move=None, arrows=None, highlights=None, encoding=None):
+    """Build the cache key for a rendered board.
+
+    Only the piece placement is used from the board, so positions that differ
+    in move counters or castling rights share one image. Pass the encoding
+    when the cached value is encoded bytes rather than a PIL image.
+    """
+    return (
+        board.board_fen(),
+        last_move.uci() if last_move else None,
+        move_keys(arrows),
+        move_keys(highlights),
+        theme,
+        square_size,
+        encoding,
+    )
+
+
+class RenderCache:
+    """Size-bounded LRU cache of rendered board images with hit/miss counters.
+
+    With a disk tier, encoded (bytes) entries are also persisted there, so
+    other server processes and restarts can reuse them.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk=None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        """Return the cached value for key, calling render() to build it on a miss"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.put(key, value)
+                return value
+
+        value = render()
+        self.put(key, value)
+        if self.disk is not None and isinstance(value, bytes):
+            self.disk.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+def remove_stale_renders(parent, current):
+    """Delete the image directories of other renderer versions or fonts under parent"""
+    try:
+        names = os.listdir(parent)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(parent, name)
+        if name != current and SIGNATURE_DIR.fullmatch(name) and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def default_disk_cache():
+    """Shared on-disk tier, or None when disabled (empty CHESS_RENDER_CACHE_DIR) or unwritable.
+
+    Images live in a subdirectory named by render_signature(), so a new
+    renderer version or a different font never serves stale files; the
+    directories of earlier versions are deleted on startup.
+    """
+    if not DEFAULT_CACHE_DIR:
+        return None
+    signature = render_signature()
+    remove_stale_renders(DEFAULT_CACHE_DIR, signature)
+    try:
+        return DiskCache(os.path.join(DEFAULT_CACHE_DIR, signature))
+    except OSError:
+        return None
+
+
+render_cache = RenderCache(disk=default_disk_cache())
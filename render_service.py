@@ -0,0 +1,153 @@
+import collections
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+
+import chess
+
+from board_render import render_game_board, render_puzzle_board
+from image_encoding import encode_image
+from sprites import sprite_atlas
+from utils import render_board
+
+DEFAULT_MAX_PENDING = 32
+DEFAULT_TIMEOUT = 5.0
+TIMING_WINDOW = 500
+
+
+def render_key(key):
+    """Render the board described by a render_cache.board_key to encoded bytes.
+
+    Runs inside worker processes, so it only needs the key itself.
+    """
+    board_fen, last_move, arrows, highlights, theme, square_size, encoding = key
+    board = chess.Board(None)
+    board.set_board_fen(board_fen)
+    arrows = [chess.Move.from_uci(uci) for uci in arrows]
+    highlights = [chess.Move.from_uci(uci) for uci in highlights]
+
+    if theme == "classic":
+        img = render_board(board, square_size)
+    elif theme == "puzzle":
+        img = render_puzzle_board(board, arrows, highlights, square_size)
+    elif theme == "game":
+        img = render_game_board(board, chess.Move.from_uci(last_move) if last_move else None)
+    else:
+        raise ValueError(f"Unknown board theme: {theme}")
+    return encode_image(img, encoding)
+
+
+def timed_render_key(key, submitted_at):
+    """Worker entry point: returns (bytes, queue_wait_seconds, render_seconds)"""
+    started_at = time.time()
+    data = render_key(key)
+    return data, started_at - submitted_at, time.time() - started_at
+
+
+def init_worker():
+    sprite_atlas.preload()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RenderService:
+    """Renders boards in a small process pool so sessions do not contend for the GIL.
+
+    At most max_pending jobs may be in flight; beyond that render() falls back
+    to the caller's local renderer instead of queueing without bound.
+    """
+
+    def __init__(self, workers, max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+        self._lock = threading.Lock()
+        self._waits = collections.deque(maxlen=TIMING_WINDOW)
+        self._renders = collections.deque(maxlen=TIMING_WINDOW)
+        self._totals = collections.deque(maxlen=TIMING_WINDOW)
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, key):
+        """Queue a render; returns a Future of (bytes, wait, render) or None if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        future = self._executor.submit(timed_render_key, key, time.time())
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(self, key, render_local):
+        """Encoded bytes for key from the pool, or from render_local() if it is busy or fails"""
+        submitted_at = time.perf_counter()
+        future = self.submit(key)
+        if future is None:
+            return render_local()
+        try:
+            data, wait, render_time = future.result(timeout=self.timeout)
+        except Exception:
+            future.cancel()
+            with self._lock:
+                self.failed += 1
+            return render_local()
+
+        with self._lock:
+            self.completed += 1
+            self._waits.append(wait)
+            self._renders.append(render_time)
+            self._totals.append(time.perf_counter() - submitted_at)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "queue_wait_p50": percentile(self._waits, 0.5),
+                "render_p50": percentile(self._renders, 0.5),
+                "total_p50": percentile(self._totals, 0.5),
+                "total_p95": percentile(self._totals, 0.95),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_render_service(workers):
+    """Process-wide RenderService, created on first use; None when workers is 0"""
+    global _service
+    if workers <= 0:
+        return None
+    with _service_lock:
+        if _service is None:
+            _service = RenderService(workers)
+        return _service
+
+
+def render_encoded(key, render_local, workers=0):
+    """Render through the service when workers > 0, otherwise call render_local()"""
+    service = get_render_service(workers)
+    if service is None:
+        return render_local()
+    return service.render(key, render_local)
@@ -0,0 +1,349 @@
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+
+import chess.engine
+
+from analysis_cache import analysis_cache, position_key
+from engine_scheduler import BACKGROUND, INTERACTIVE, percentile
+
+# p99 target for searches a student is waiting on, end to end including queueing.
+INTERACTIVE_SLO = 1.5
+LATENCY_WINDOW = 50
+MIN_SCALE = 0.25
+SCALE_DOWN = 0.8
+SCALE_UP = 1.1
+# Budgets grow back only while p99 stays below this fraction of the SLO.
+RECOVERY_FRACTION = 0.6
+
+# max_depth caps playing strength, budget caps the time the search may take.
+SearchProfile = collections.namedtuple("SearchProfile", "max_depth budget")
+
+
+def complete_iteration(lines, width):
+    """The lines of one fully reported depth iteration, or None if still in progress"""
+    if len(lines) < width:
+        return None
+    depths = {lines[i].get("depth") for i in range(1, width + 1) if i in lines}
+    if len(depths) != 1:
+        return None
+    return [lines[i] for i in range(1, width + 1)]
+
+
+async def iterative_analysis(protocol, board, limit, multipv=1, deadline=None, on_iteration=None):
+    """Run engine.analysis() and return the deepest completed iteration as a list of InfoDicts.
+
+    Each completed depth is passed to on_iteration as it arrives. deadline is
+    a callable giving a time.monotonic() stop time (it may move while the
+    search runs); the search then stops at the deepest iteration completed
+    by that time, though at least one full iteration is always waited for.
+    """
+    width = max(1, min(multipv, board.legal_moves.count()))
+    analysis = await protocol.analysis(board, limit, multipv=multipv)
+    lines = {}
+    completed = None
+    try:
+        while True:
+            remaining = deadline() - time.monotonic() if deadline is not None else None
+            if completed is not None and remaining is not None and remaining <= 0:
+                break
+            try:
+                if completed is None or remaining is None:
+                    info = await analysis.get()
+                else:
+                    info = await asyncio.wait_for(analysis.get(), remaining)
+            except asyncio.TimeoutError:
+                continue  # the deadline may have moved; re-check it
+            except chess.engine.AnalysisComplete:
+                break
+            if "pv" not in info or "depth" not in info or info.get("lowerbound") or info.get("upperbound"):
+                continue
+            lines[info.get("multipv", 1)] = info
+            iteration = complete_iteration(lines, width)
+            if iteration is not None:
+                completed = iteration
+                if on_iteration is not None:
+                    on_iteration(completed)
+    finally:
+        analysis.stop()
+        await analysis.wait()
+    return completed or [analysis.info]
+
+
+def lines_depth(lines):
+    return min(info.get("depth", 0) for info in lines)
+
+
+class AnalysisStream(concurrent.futures.Future):
+    """Future of a search's final result that can also be read while the search runs.
+
+    latest() returns the deepest completed iteration so far in the same shape
+    as the final result: an InfoDict, or a list of them when multipv was given.
+    """
+
+    def __init__(self, multipv=None, max_depth=None, deadline=None, interactive=False):
+        super().__init__()
+        self.multipv = multipv
+        self.width = multipv or 1
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self.interactive = interactive
+        self.started = time.monotonic()
+        self.depth = 0
+        self._lines = None
+
+    def publish(self, lines):
+        self._lines = lines[:self.width]
+        self.depth = lines_depth(self._lines)
+
+    def latest(self):
+        lines = self._lines
+        if lines is None:
+            return None
+        return lines if self.multipv else lines[0]
+
+    @classmethod
+    def finished(cls, lines, multipv=None):
+        stream = cls(multipv)
+        stream.publish(lines)
+        stream.set_result(stream.latest())
+        return stream
+
+
+class SharedSearch:
+    """One engine search of a position, feeding every consumer that asked about it"""
+
+    def __init__(self, key, board, max_depth, width, deadline, views, priority, session):
+        self.key = key
+        self.board = board
+        self.max_depth = max_depth
+        self.width = width
+        self.deadline = deadline
+        self.views = views
+        self.priority = priority
+        self.session = session
+        self.dispatched = None  # time.monotonic() when an engine took the search
+        self.searched = None  # engine seconds spent reaching lines
+        self.lines = None
+        self.future = None
+        self.superseded = False
+
+    def covers(self, max_depth, width):
+        return self.max_depth >= max_depth and self.width >= width
+
+    def serves(self, max_depth, width, priority):
+        """Whether a request can join this search as it is"""
+        return self.covers(max_depth, width) and (self.dispatched is not None or self.priority <= priority)
+
+
+class SearchController:
+    """Runs searches against a latency budget instead of a fixed depth.
+
+    Budgets are scaled down while the recent p99 latency of interactive
+    searches is above the SLO (the pool is busy) and grow back once it is
+    comfortably below. The depth each search reached is recorded. Results
+    are stored in the analysis cache at that depth, or, when the budget cut
+    the search short, as a search of the engine time it took; lookups ask
+    for the depth cap or the budget, whichever a search would stop at.
+
+    Searches of one position are multiplexed: while a search runs, other
+    requests for the same position join it, and a request needing more depth
+    or more multipv lines restarts it at the combined strength. Every caller
+    gets its own AnalysisStream, cut to its multipv and finished as soon as
+    its own depth cap or budget is reached. A restarted search is queued at
+    the most urgent priority of the requests it serves, and a search still
+    waiting for an engine is restarted when a more urgent request joins it.
+    """
+
+    def __init__(self, async_engine, slo=INTERACTIVE_SLO, cache=analysis_cache):
+        self.async_engine = async_engine
+        self.slo = slo
+        self.cache = cache
+        self.scale = 1.0
+        self.started = 0
+        self.joined = 0
+        self.upgraded = 0
+        self.promoted = 0
+        self._shared = {}  # zobrist -> SharedSearch
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._depths = collections.deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._search_lock = threading.RLock()
+
+    def budget_for(self, profile):
+        with self._lock:
+            return profile.budget * self.scale
+
+    def search(self, board, profile, multipv=None, interactive=True, priority=None, session=None):
+        """AnalysisStream of an InfoDict (or a list of them when multipv is given) within the profile's budget.
+
+        priority defaults to engine_scheduler.INTERACTIVE for interactive
+        searches and BACKGROUND otherwise.
+        """
+        width = multipv or 1
+        if priority is None:
+            priority = INTERACTIVE if interactive else BACKGROUND
+        budget = self.budget_for(profile)
+        if self.cache is not None:
+            infos = self.cache.get(board, chess.engine.Limit(depth=profile.max_depth, time=budget), width)
+            if infos is not None:
+                return AnalysisStream.finished(infos, multipv)
+
+        view = AnalysisStream(multipv, profile.max_depth, time.monotonic() + budget, interactive)
+        key = position_key(board)
+        with self._search_lock:
+            shared = self._shared.get(key)
+            if shared is not None and shared.serves(profile.max_depth, width, priority):
+                self.joined += 1
+                shared.views.append(view)
+                shared.deadline = max(shared.deadline, view.deadline)
+                if shared.lines is not None:
+                    self._feed(view, shared.lines)
+            else:
+                views = [view]
+                max_depth, deadline = profile.max_depth, view.deadline
+                if shared is not None:
+                    if shared.covers(max_depth, width):
+                        self.promoted += 1
+                    else:
+                        self.upgraded += 1
+                    shared.superseded = True
+                    shared.future.cancel()
+                    views += shared.views
+                    max_depth = max(max_depth, shared.max_depth)
+                    width = max(width, shared.width)
+                    deadline = max(deadline, shared.deadline)
+                    if shared.priority < priority:
+                        priority, session = shared.priority, shared.session
+                self._start(SharedSearch(key, board.copy(), max_depth, width, deadline, views, priority, session))
+
+        timer = threading.Timer(max(0.0, view.deadline - time.monotonic()), self._feed, args=(view, None))
+        timer.daemon = True
+        timer.start()
+        view.add_done_callback(lambda view: self._detach(key, view, timer))
+        return view
+
+    def _start(self, shared):
+        self.started += 1
+        self._shared[shared.key] = shared
+        limit = chess.engine.Limit(depth=shared.max_depth)
+
+        def analyse(protocol):
+            shared.dispatched = time.monotonic()
+            return iterative_analysis(protocol, shared.board, limit, shared.width, lambda: shared.deadline,
+                                      lambda lines: self._publish(shared, lines))
+
+        shared.future = self.async_engine.run(analyse, shared.priority, shared.session)
+        shared.future.add_done_callback(lambda future: self._finish(shared, future))
+
+    def _publish(self, shared, lines):
+        with self._search_lock:
+            if shared.superseded:
+                return
+            shared.lines = lines
+            shared.searched = time.monotonic() - shared.dispatched
+            for view in list(shared.views):
+                self._feed(view, lines)
+
+    def _feed(self, view, lines, final=False):
+        """Pass a new iteration (or just the passing of time) on to a consumer"""
+        with self._search_lock:
+            if view.done():
+                return
+            if lines and (view.latest() is None or lines_depth(lines) >= view.depth):
+                view.publish(lines)
+            if view.latest() is None:
+                return
+            if final or view.depth >= view.max_depth or time.monotonic() >= view.deadline:
+                try:
+                    view.set_result(view.latest())
+                except concurrent.futures.InvalidStateError:
+                    return  # cancelled by its consumer, which does not take the lock
+                self.record(time.monotonic() - view.started, view.depth, view.interactive)
+
+    def _finish(self, shared, future):
+        with self._search_lock:
+            if shared.superseded:
+                return
+            if self._shared.get(shared.key) is shared:
+                del self._shared[shared.key]
+            if future.cancelled():
+                for view in shared.views:
+                    view.cancel()
+                return
+            if future.exception() is not None:
+                for view in shared.views:
+                    try:
+                        view.set_exception(future.exception())
+                    except concurrent.futures.InvalidStateError:
+                        pass
+                return
+            lines = future.result()
+            shared.lines = lines
+            for view in list(shared.views):
+                self._feed(view, lines, final=True)
+        depth = lines_depth(lines)
+        if self.cache is not None and depth:
+            if depth >= shared.max_depth:
+                self.cache.put(shared.board, chess.engine.Limit(depth=depth), shared.width, lines)
+            elif shared.searched is not None:
+                # Cut short by the budget: stored as the engine time it took to get there, excluding
+                # time spent queued, so only requests with no more time to spend are answered by it.
+                self.cache.put(shared.board, chess.engine.Limit(time=round(shared.searched, 3)), shared.width,
+                               lines)
+
+    def _detach(self, key, view, timer):
+        timer.cancel()
+        if not view.cancelled():
+            return
+        with self._search_lock:
+            shared = self._shared.get(key)
+            if shared is None or view not in shared.views:
+                return
+            shared.views.remove(view)
+            if not shared.views:
+                del self._shared[key]
+                shared.future.cancel()
+
+    def record(self, latency, depth, interactive):
+        with self._lock:
+            self._depths.append(depth)
+            if not interactive:
+                return
+            self._latencies.append(latency)
+            p99 = percentile(self._latencies, 0.99)
+            if p99 > self.slo:
+                self.scale = max(MIN_SCALE, self.scale * SCALE_DOWN)
+            elif p99 < self.slo * RECOVERY_FRACTION:
+                self.scale = min(1.0, self.scale * SCALE_UP)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "slo": self.slo,
+                "budget_scale": self.scale,
+                "latency_p50": percentile(self._latencies, 0.5),
+                "latency_p99": percentile(self._latencies, 0.99),
+                "depth_p50": percentile(self._depths, 0.5),
+                "last_depth": self._depths[-1] if self._depths else None,
+                "searches_started": self.started,
+                "searches_joined": self.joined,
+                "searches_upgraded": self.upgraded,
+                "searches_promoted": self.promoted,
+                "searches_running": len(self._shared),
+            }
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_search_controller(async_engine):
+    """Shared SearchController for an AsyncEngine, so load is measured across all sessions"""
+    with _controllers_lock:
+        controller = _controllers.get(id(async_engine))
+        if controller is None or controller.async_engine is not async_engine:
+            controller = _controllers[id(async_engine)] = SearchController(async_engine)
+        return controller
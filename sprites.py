@@ -0,0 +1,102 @@
+import os
+import threading
+
+from PIL import Image
+
+PIECE_SYMBOLS = "PNBRQKpnbrqk"
+
+# Sprite sizes used by the built-in renderers: the puzzle board pastes
+# 39px pieces onto 45px squares, the game board uses 64px and utils 80px.
+PRELOAD_SIZES = (39, 64, 80)
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SEARCH_DIRS = (
+    os.path.join(MODULE_DIR, "assets"),
+    os.path.join(os.getcwd(), "assets"),
+    MODULE_DIR,
+)
+
+
+def sprite_name(symbol):
+    """File stem for a piece symbol, e.g. 'P' -> 'wp' and 'n' -> 'bn'"""
+    return ("w" if symbol.isupper() else "b") + symbol.lower()
+
+
+class SpriteAtlas:
+    """Piece images decoded once and kept in memory at every size requested.
+
+    File names are matched case-insensitively, so both ``wP.png`` and
+    ``wp.png`` resolve to the white pawn.
+    """
+
+    def __init__(self, search_dirs=DEFAULT_SEARCH_DIRS):
+        self.search_dirs = search_dirs
+        self._originals = None
+        self._sized = {}
+        self._lock = threading.Lock()
+
+    def find_files(self):
+        """Map each piece symbol to the first matching PNG in the search dirs"""
+        paths = {}
+        for folder in self.search_dirs:
+            if not os.path.isdir(folder):
+                continue
+            by_name = {name.lower(): name for name in os.listdir(folder)}
+            for symbol in PIECE_SYMBOLS:
+                if symbol in paths:
+                    continue
+                name = by_name.get(sprite_name(symbol) + ".png")
+                if name:
+                    paths[symbol] = os.path.join(folder, name)
+        return paths
+
+    def load(self):
+        """Decode all piece PNGs; later calls are free"""
+        with self._lock:
+            if self._originals is None:
+                originals = {}
+                for symbol, path in self.find_files().items():
+                    with Image.open(path) as img:
+                        originals[symbol] = img.convert("RGBA")
+                self._originals = originals
+            return self._originals
+
+    def missing(self):
+        """File names of pieces that could not be found"""
+        originals = self.load()
+        return [sprite_name(s) + ".png" for s in PIECE_SYMBOLS if s not in originals]
+
+    def sprite(self, symbol, size):
+        """Return (image, alpha_mask) for a piece at size x size, or None if missing"""
+        key = (symbol, size)
+        cached = self._sized.get(key)
+        if cached is not None:
+            return cached
+
+        original = self.load().get(symbol)
+        if original is None:
+            return None
+        img = original.resize((size, size), Image.Resampling.LANCZOS)
+        entry = (img, img.getchannel("A"))
+        with self._lock:
+            self._sized[key] = entry
+        return entry
+
+    def preload(self, sizes=PRELOAD_SIZES):
+        for size in sizes:
+            for symbol in PIECE_SYMBOLS:
+                self.sprite(symbol, size)
+
+    def clear(self):
+        """Forget all decoded and resized sprites"""
+        with self._lock:
+            self._originals = None
+            self._sized = {}
+
+
+sprite_atlas = SpriteAtlas()
+
+
+def piece_sprite(piece, size):
+    """Shortcut for sprite_atlas.sprite() taking a chess.Piece"""
+    return sprite_atlas.sprite(piece.symbol(), size)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# The modules live at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+
+@pytest.fixture
+def engine_pool():
+    """One-engine EnginePool running tests/fakefish.py instead of Stockfish"""
+    from engine_pool import EnginePool
+
+    pool = EnginePool([sys.executable, os.path.join(TESTS_DIR, "fakefish.py")], size=1)
+    yield pool
+    pool.close()
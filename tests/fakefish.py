@@ -0,0 +1,63 @@
+"""A tiny UCI engine for tests: reports every legal move in order, one depth per 10 ms per ply."""
+import sys
+import threading
+import time
+
+import chess
+
+board = chess.Board()
+multipv = 1
+stop = threading.Event()
+search = None
+output_lock = threading.Lock()
+
+
+def send(line):
+    with output_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def go(max_depth):
+    moves = list(board.legal_moves)
+    started = time.monotonic()
+    for depth in range(1, max_depth + 1):
+        time.sleep(0.01 * depth)
+        if stop.is_set():
+            break
+        elapsed = int((time.monotonic() - started) * 1000)
+        for index, move in enumerate(moves[:multipv]):
+            send(f"info depth {depth} seldepth {depth} multipv {index + 1} score cp {50 - 10 * index + depth} "
+                 f"nodes {1000 * depth} time {elapsed} pv {move.uci()}")
+    send(f"bestmove {moves[0].uci() if moves else '(none)'}")
+
+
+for line in sys.stdin:
+    parts = line.split()
+    if not parts:
+        continue
+    command = parts[0]
+    if command == "uci":
+        send("id name FakeFish")
+        send("option name MultiPV type spin default 1 min 1 max 500")
+        send("uciok")
+    elif command == "isready":
+        send("readyok")
+    elif command == "setoption" and "MultiPV" in parts:
+        multipv = int(parts[-1])
+    elif command == "position":
+        moves_at = parts.index("moves") if "moves" in parts else len(parts)
+        board = chess.Board(" ".join(parts[2:moves_at])) if parts[1] == "fen" else chess.Board()
+        for uci in parts[moves_at + 1:]:
+            board.push_uci(uci)
+    elif command == "go":
+        depth = int(parts[parts.index("depth") + 1]) if "depth" in parts else 20
+        stop.clear()
+        search = threading.Thread(target=go, args=(depth,))
+        search.start()
+    elif command == "stop":
+        stop.set()
+        if search:
+            search.join()
+    elif command == "quit":
+        break
@@ -0,0 +1,61 @@
+import chess
+import chess.engine
+
+from analysis_cache import AnalysisCache, request_keys, satisfies
+
+
+def lines(depth, count=1):
+    board = chess.Board()
+    moves = list(board.legal_moves)[:count]
+    return [{"depth": depth, "multipv": i + 1, "pv": [move],
+             "score": chess.engine.PovScore(chess.engine.Cp(10), chess.WHITE)}
+            for i, move in enumerate(moves)]
+
+
+def test_deeper_entry_satisfies_shallower_request():
+    entry = (("depth", 18), 1, lines(18))
+    assert satisfies(entry, ("depth", 12), 1)
+    assert satisfies(entry, ("depth", 18), 1)
+    assert not satisfies(entry, ("depth", 20), 1)
+
+
+def test_achieved_depth_counts_for_other_limits():
+    entry = (("time", 0.5), 1, lines(16))
+    assert satisfies(entry, ("depth", 16), 1)
+    assert not satisfies(entry, ("depth", 17), 1)
+
+
+def test_longer_search_satisfies_shorter_request():
+    entry = (("time", 1.5), 1, lines(10))
+    assert satisfies(entry, ("time", 1.0), 1)
+    assert not satisfies(entry, ("time", 2.0), 1)
+    assert not satisfies(entry, ("nodes", 1000), 1)
+
+
+def test_narrower_multipv_does_not_satisfy():
+    entry = (("depth", 20), 1, lines(20))
+    assert not satisfies(entry, ("depth", 10), 3)
+    assert satisfies((("depth", 20), 3, lines(20, 3)), ("depth", 10), 2)
+
+
+def test_request_keys():
+    assert request_keys(chess.engine.Limit(depth=12)) == [("depth", 12)]
+    assert request_keys(chess.engine.Limit(depth=12, time=1.5)) == [("depth", 12), ("time", 1.5)]
+    assert request_keys(chess.engine.Limit(white_clock=60, black_clock=60)) is None
+
+
+def test_budget_cut_search_answers_budgeted_requests():
+    cache = AnalysisCache()
+    board = chess.Board()
+    cache.put(board, chess.engine.Limit(time=1.2), 1, lines(14))
+    assert cache.get(board, chess.engine.Limit(depth=20, time=1.0)) is not None
+    assert cache.get(board, chess.engine.Limit(depth=20, time=2.0)) is None
+    assert cache.get(board, chess.engine.Limit(depth=12, time=2.0)) is not None
+    assert cache.stats()["hits"] == 2
+
+
+def test_get_cuts_lines_to_multipv():
+    cache = AnalysisCache()
+    board = chess.Board()
+    cache.put(board, chess.engine.Limit(depth=15), 3, lines(15, 3))
+    assert len(cache.get(board, chess.engine.Limit(depth=15), 2)) == 2
@@ -0,0 +1,40 @@
+import random
+
+import chess
+
+from board_render import IncrementalBoardRenderer, render_game_board
+
+
+def random_walk(seed, plies=60):
+    """Boards along a random game that also takes moves back now and then"""
+    rng = random.Random(seed)
+    board = chess.Board()
+    for _ in range(plies):
+        if board.move_stack and rng.random() < 0.2:
+            board.pop()
+        elif board.is_game_over():
+            board.pop()
+        else:
+            board.push(rng.choice(list(board.legal_moves)))
+        yield board
+
+
+def test_incremental_render_matches_full_redraw():
+    for seed in range(3):
+        renderer = IncrementalBoardRenderer()
+        for board in random_walk(seed):
+            assert renderer.render(board).tobytes() == render_game_board(board).tobytes()
+
+
+def test_incremental_render_repaints_only_changed_squares():
+    renderer = IncrementalBoardRenderer()
+    board = chess.Board()
+    renderer.render(board)
+    assert renderer.last_dirty == 64
+    board.push_san("e4")
+    renderer.render(board)
+    assert renderer.last_dirty == 2
+    board.push_san("e5")
+    renderer.render(board)
+    # The two new squares plus the two that lose the last-move highlight.
+    assert renderer.last_dirty == 4
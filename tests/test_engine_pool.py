@@ -0,0 +1,34 @@
+import os
+import signal
+
+import chess
+import chess.engine
+import pytest
+
+
+def kill(engine):
+    os.kill(engine.transport.get_pid(), signal.SIGKILL)
+    engine.returncode.result(timeout=5)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs POSIX signals")
+def test_dead_engine_is_replaced_on_checkin(engine_pool):
+    engine = engine_pool.checkout(timeout=10)
+    kill(engine)
+    engine_pool.checkin(engine)
+    assert engine_pool.stats()["restarted"] == 1
+
+    replacement = engine_pool.checkout(timeout=10)
+    assert replacement is not engine
+    assert replacement.analyse(chess.Board(), chess.engine.Limit(depth=2))["depth"] == 2
+    engine_pool.checkin(replacement)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs POSIX signals")
+def test_lease_reports_an_engine_that_died_mid_command(engine_pool):
+    with pytest.raises(chess.engine.EngineTerminatedError):
+        with engine_pool.lease(timeout=10) as engine:
+            kill(engine)
+            engine.analyse(chess.Board(), chess.engine.Limit(depth=2))
+    with engine_pool.lease(timeout=10) as engine:
+        assert engine.analyse(chess.Board(), chess.engine.Limit(depth=2))["depth"] == 2
@@ -0,0 +1,104 @@
+import concurrent.futures
+import time
+
+import pytest
+
+import engine_scheduler
+from engine_scheduler import BACKGROUND, HINT, INTERACTIVE, EngineOverloaded, EngineScheduler
+
+
+class FakePool:
+    """Hands out placeholder engines; the scheduler never asks for more than size at once"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def request(self):
+        future = concurrent.futures.Future()
+        future.set_result(object())
+        return future
+
+    def checkin(self, engine, broken=False):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def idle_cpu(monkeypatch):
+    monkeypatch.setattr(engine_scheduler, "cpu_load", lambda: 0.0)
+
+
+def drain(scheduler, first, tickets):
+    """Check engines back in one at a time and return the tickets' names in the order they were served"""
+    served = []
+    engine = first.result(0)
+    while len(served) < len(tickets):
+        scheduler.checkin(engine)
+        name, future = next((name, future) for name, future in tickets.items()
+                            if future.done() and name not in served)
+        served.append(name)
+        engine = future.result(0)
+    return served
+
+
+def test_more_urgent_work_runs_first():
+    scheduler = EngineScheduler(FakePool(1))
+    first = scheduler.request(BACKGROUND, "a")
+    tickets = {
+        "background": scheduler.request(BACKGROUND, "b"),
+        "hint": scheduler.request(HINT, "c"),
+        "interactive": scheduler.request(INTERACTIVE, "d"),
+    }
+    assert not any(future.done() for future in tickets.values())
+    assert drain(scheduler, first, tickets) == ["interactive", "hint", "background"]
+
+
+def test_sessions_take_turns_within_a_priority():
+    scheduler = EngineScheduler(FakePool(1))
+    first = scheduler.request(BACKGROUND, "a")
+    tickets = {"a1": scheduler.request(BACKGROUND, "a"), "a2": scheduler.request(BACKGROUND, "a"),
+               "b1": scheduler.request(BACKGROUND, "b")}
+    assert drain(scheduler, first, tickets) == ["a1", "b1", "a2"]
+
+
+def test_session_job_limit():
+    scheduler = EngineScheduler(FakePool(3), session_limit=2)
+    held = [scheduler.request(BACKGROUND, "a") for _ in range(2)]
+    waiting = scheduler.request(BACKGROUND, "a")
+    other = scheduler.request(BACKGROUND, "b")
+    assert all(future.done() for future in held)
+    assert not waiting.done()
+    assert other.done()
+    scheduler.checkin(held[0].result(0))
+    assert waiting.done()
+
+
+def test_cancelled_tickets_are_skipped():
+    scheduler = EngineScheduler(FakePool(1))
+    first = scheduler.request(BACKGROUND, "a")
+    cancelled = scheduler.request(INTERACTIVE, "b")
+    queued = scheduler.request(BACKGROUND, "c")
+    assert cancelled.cancel()
+    scheduler.checkin(first.result(0))
+    assert queued.done()
+
+
+def test_overload_sheds_low_priority_work(monkeypatch):
+    monkeypatch.setattr(engine_scheduler, "SHED_HOLD", 0.2)
+    monkeypatch.setattr(engine_scheduler, "WAIT_HORIZON", 0.1)
+    scheduler = EngineScheduler(FakePool(1), shed_wait=0.05)
+    first = scheduler.request(BACKGROUND, "a")
+    queued = scheduler.request(BACKGROUND, "b")
+    time.sleep(0.1)
+
+    assert scheduler.overloaded()
+    assert isinstance(queued.exception(0), EngineOverloaded)
+    assert isinstance(scheduler.request(HINT, "c").exception(0), EngineOverloaded)
+    interactive = scheduler.request(INTERACTIVE, "d")
+    assert not interactive.done()
+    assert scheduler.stats()["shed"] == 2
+
+    scheduler.checkin(first.result(0))
+    scheduler.checkin(interactive.result(0))
+    time.sleep(0.25)
+    assert not scheduler.overloaded()
+    assert scheduler.request(HINT, "c").done()
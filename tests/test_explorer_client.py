@@ -0,0 +1,83 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+from explorer_client import ExplorerClient
+
+MOVES = [{"uci": "e2e4", "white": 10, "draws": 5, "black": 7}]
+
+
+class StubExplorer(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    delay = 0.05
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        time.sleep(self.delay)
+        body = json.dumps({"moves": MOVES}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def explorer():
+    StubExplorer.requests = []
+    StubExplorer.delay = 0.05
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubExplorer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/lichess"
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_lookups_share_one_request(explorer):
+    client = ExplorerClient(explorer)
+    futures = [client.fetch("fen") for _ in range(10)]
+    assert all(future.result(5) == MOVES for future in futures)
+    assert len(StubExplorer.requests) == 1
+    assert client.moves("fen") == MOVES
+    stats = client.stats()
+    assert (stats["requests"], stats["coalesced"], stats["hits"]) == (1, 9, 1)
+
+
+def test_slow_answer_is_empty_then_cached(explorer):
+    StubExplorer.delay = 0.3
+    client = ExplorerClient(explorer)
+    assert client.moves("fen", deadline=0.05) == []
+    time.sleep(0.5)
+    assert client.moves("fen", deadline=0.05) == MOVES
+    assert len(StubExplorer.requests) == 1
+
+
+def test_unreachable_explorer_gives_empty_list():
+    client = ExplorerClient("http://127.0.0.1:1/lichess", timeout=1.0)
+    assert client.moves("fen", deadline=2.0) == []
+    # The failure is remembered, so the next lookup does not try again.
+    assert client.moves("fen") == []
+    assert client.stats()["requests"] == 1
+    assert client.stats()["errors"] == 1
+
+
+def test_cancelling_a_watcher_leaves_the_fetch_running(explorer):
+    StubExplorer.delay = 0.2
+    client = ExplorerClient(explorer)
+    first, second = client.watch("fen"), client.watch("fen")
+    assert first.cancel()
+    assert second.result(5) == MOVES
+    assert client.moves("fen") == MOVES
+    assert len(StubExplorer.requests) == 1
+
+
+def test_watcher_of_a_failed_fetch_gets_an_empty_list():
+    client = ExplorerClient("http://127.0.0.1:1/lichess", timeout=1.0)
+    assert client.watch("fen").result(5) == []
@@ -0,0 +1,97 @@
+import io
+import os
+
+import chess
+import pytest
+
+from build_move_stats import build_index, merge_runs, spill, split_games
+from move_stats import MoveStats, read_records
+
+PGN = """[Event "One"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 1-0
+
+[Event "Two"]
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 0-1
+
+[Event "Three"]
+[Result "1/2-1/2"]
+
+1. d4 d5
+2. c4 1/2-1/2
+
+[Event "Unfinished"]
+[Result "*"]
+
+1. e4 e5 *
+"""
+
+
+def build(tmp_path, name="stats.idx", **options):
+    path = str(tmp_path / name)
+    summary = build_index([io.StringIO(PGN)], path, workers=1, chunk_size=1, **options)
+    return path, summary
+
+
+def test_split_games():
+    games = list(split_games(io.StringIO(PGN)))
+    assert len(games) == 4
+    assert games[0].startswith('[Event "One"]')
+    assert "2. c4 1/2-1/2" in games[2]
+
+
+def test_build_index_and_lookup(tmp_path):
+    path, summary = build(tmp_path)
+    assert (summary["games"], summary["skipped"]) == (3, 1)
+    stats = MoveStats(path)
+    try:
+        assert stats.lookup(chess.Board()) == [
+            {"uci": "e2e4", "san": "e4", "white": 1, "draws": 0, "black": 1},
+            {"uci": "d2d4", "san": "d4", "white": 0, "draws": 1, "black": 0},
+        ]
+        board = chess.Board()
+        board.push_san("e4")
+        assert sorted(move["san"] for move in stats.lookup(board)) == ["c5", "e5"]
+        assert stats.lookup(chess.Board(), count=1)[0]["san"] == "e4"
+        board.push_san("h5")
+        assert stats.lookup(board) == []
+    finally:
+        stats.close()
+
+
+def test_min_games(tmp_path):
+    path, _ = build(tmp_path, min_games=2)
+    stats = MoveStats(path)
+    try:
+        assert [move["san"] for move in stats.lookup(chess.Board())] == ["e4"]
+    finally:
+        stats.close()
+
+
+def test_spilled_runs_merge_to_the_same_index(tmp_path):
+    whole, summary = build(tmp_path, "whole.idx")
+    spilled, spilled_summary = build(tmp_path, "spilled.idx", spill_entries=2, merge_fan_in=2)
+    assert summary["runs"] == 1
+    assert spilled_summary["runs"] > 2
+    with open(whole, "rb") as a, open(spilled, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_merge_rounds_add_up_and_clean_up(tmp_path):
+    counts = [{(key, 1): [1, 0, 0] for key in range(run, run + 3)} for run in range(7)]
+    runs = [spill(run, str(tmp_path)) for run in counts]
+    out = str(tmp_path / "merged.idx")
+    assert merge_runs(runs, out, min_games=3, fan_in=3) == 5
+    with open(out, "rb") as f:
+        assert [record[:3] for record in read_records(f)] == [(key, 1, 3) for key in range(2, 7)]
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(run) for run in runs] + ["merged.idx"])
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "bogus.idx"
+    path.write_bytes(b"nothing here")
+    with pytest.raises(ValueError):
+        MoveStats(str(path))
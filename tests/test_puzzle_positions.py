@@ -0,0 +1,63 @@
+import random
+
+import chess
+import numpy as np
+import pytest
+
+from puzzle_positions import _completions, draw_placement, placement_table, random_puzzle_board
+
+PIECE_SETS = [(chess.QUEEN, chess.ROOK), (chess.ROOK, chess.KNIGHT), (chess.BISHOP, chess.BISHOP),
+              (chess.KNIGHT, chess.QUEEN)]
+
+
+def placement_board(white_type, black_type, white_king, black_king, white, black):
+    board = chess.Board(None)
+    board.set_piece_at(white_king, chess.Piece(chess.KING, chess.WHITE))
+    board.set_piece_at(black_king, chess.Piece(chess.KING, chess.BLACK))
+    board.set_piece_at(white, chess.Piece(white_type, chess.WHITE))
+    board.set_piece_at(black, chess.Piece(black_type, chess.BLACK))
+    board.turn = chess.WHITE
+    return board
+
+
+def is_valid_placement(white_type, black_type, *squares):
+    if len(set(squares)) < 4:
+        return False
+    board = placement_board(white_type, black_type, *squares)
+    return board.is_valid() and not board.is_insufficient_material()
+
+
+@pytest.mark.parametrize("white_type, black_type", PIECE_SETS)
+def test_drawn_placements_are_valid(white_type, black_type):
+    rng = random.Random(1)
+    for _ in range(500):
+        squares = draw_placement(white_type, black_type, rng)
+        assert is_valid_placement(white_type, black_type, *squares), squares
+
+
+@pytest.mark.parametrize("white_type, black_type", PIECE_SETS)
+@pytest.mark.parametrize("white_king, black_king", [(chess.E1, chess.E8), (chess.A1, chess.H8), (chess.D4, chess.D6)])
+def test_table_matches_python_chess(white_type, black_type, white_king, black_king):
+    expected = np.array([[is_valid_placement(white_type, black_type, white_king, black_king, white, black)
+                          for black in chess.SQUARES] for white in chess.SQUARES])
+    assert (_completions(white_type, black_type, white_king)[black_king] == expected).all()
+
+
+def test_table_counts_every_placement():
+    white_type, black_type = chess.ROOK, chess.KNIGHT
+    total = sum(int(_completions(white_type, black_type, white_king).sum()) for white_king in chess.SQUARES)
+    assert placement_table(white_type, black_type)[-1] == total
+
+
+def test_random_puzzle_board_is_playable():
+    rng = random.Random(2)
+    for _ in range(100):
+        board = random_puzzle_board("Q", "r", rng)
+        assert board.is_valid()
+        assert board.turn == chess.WHITE
+        assert not board.is_game_over()
+
+
+def test_unsupported_pieces_are_rejected():
+    with pytest.raises(ValueError):
+        random_puzzle_board("P", "r")
@@ -0,0 +1,17 @@
+from render_cache import remove_stale_renders
+
+
+def test_stale_render_directories_are_removed(tmp_path):
+    for name in ("v1-arial.ttf", "v2-default", "v2-DejaVuSans.ttf", "notes"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "entry.bin").write_bytes(b"png")
+    (tmp_path / "v0-file").write_bytes(b"not a directory")
+
+    remove_stale_renders(str(tmp_path), "v2-DejaVuSans.ttf")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["notes", "v0-file", "v2-DejaVuSans.ttf"]
+    assert (tmp_path / "v2-DejaVuSans.ttf" / "entry.bin").exists()
+
+
+def test_missing_parent_is_ignored(tmp_path):
+    remove_stale_renders(str(tmp_path / "missing"), "v1-default")
@@ -0,0 +1,80 @@
+import time
+
+import chess
+import pytest
+
+import engine_scheduler
+from analysis_cache import AnalysisCache
+from async_engine import AsyncEngine
+from search_control import SearchController, SearchProfile
+
+
+@pytest.fixture(autouse=True)
+def idle_cpu(monkeypatch):
+    monkeypatch.setattr(engine_scheduler, "cpu_load", lambda: 0.0)
+
+
+def board_after(*sans):
+    board = chess.Board()
+    for san in sans:
+        board.push_san(san)
+    return board
+
+
+def wait_for_lines(stream, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while stream.latest() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_more_urgent_request_promotes_a_queued_search(engine_pool):
+    controller = SearchController(AsyncEngine(engine_pool), slo=10.0, cache=None)
+    busy = controller.search(chess.Board(), SearchProfile(8, 5.0), interactive=False)
+    other = controller.search(board_after("d4"), SearchProfile(4, 5.0), interactive=False)
+    speculative = controller.search(board_after("e4"), SearchProfile(4, 5.0), interactive=False)
+    reply = controller.search(board_after("e4"), SearchProfile(4, 5.0))
+    speculative.cancel()
+
+    finished = []
+    reply.add_done_callback(lambda _: finished.append("reply"))
+    other.add_done_callback(lambda _: finished.append("other"))
+    assert reply.result(10)["depth"] == 4
+    other.result(10)
+    busy.result(10)
+    assert finished == ["reply", "other"]
+    assert controller.stats()["searches_promoted"] == 1
+
+
+def test_running_search_is_joined(engine_pool):
+    controller = SearchController(AsyncEngine(engine_pool), slo=10.0, cache=None)
+    background = controller.search(chess.Board(), SearchProfile(6, 5.0), interactive=False)
+    wait_for_lines(background)
+    interactive = controller.search(chess.Board(), SearchProfile(6, 5.0))
+    assert interactive.result(10)["depth"] == background.result(10)["depth"] == 6
+    stats = controller.stats()
+    assert (stats["searches_started"], stats["searches_joined"], stats["searches_promoted"]) == (1, 1, 0)
+
+
+def test_budget_cut_result_answers_smaller_budgets(engine_pool):
+    controller = SearchController(AsyncEngine(engine_pool), slo=10.0, cache=AnalysisCache())
+    first = controller.search(chess.Board(), SearchProfile(30, 0.5)).result(10)
+    assert first["depth"] < 30
+    # The engine finishes the iteration in progress before the result is stored.
+    time.sleep(0.3)
+    smaller = controller.search(chess.Board(), SearchProfile(30, 0.1))
+    assert smaller.done()
+    assert smaller.result()["depth"] == first["depth"]
+
+
+def test_search_starved_in_the_queue_is_searched_again(engine_pool):
+    controller = SearchController(AsyncEngine(engine_pool), slo=10.0, cache=AnalysisCache())
+    busy = controller.search(board_after("d4"), SearchProfile(9, 5.0), interactive=False)
+    wait_for_lines(busy)
+    # Queued behind the busy search until its budget has run out, so it gets a single iteration.
+    starved = controller.search(chess.Board(), SearchProfile(30, 0.2)).result(10)
+    busy.result(10)
+    time.sleep(0.1)
+
+    again = controller.search(chess.Board(), SearchProfile(30, 0.2))
+    assert not again.done()
+    assert again.result(10)["depth"] > starved["depth"]
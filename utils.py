@@ -1,41 +1,66 @@
-from PIL import Image, ImageDraw
+import random
+
 import chess
-import os
 
-# Path to your assets folder
-ASSET_PATH = os.path.join(os.path.dirname(__file__), "assets")
+from board_layers import background_layer
+from image_encoding import DEFAULT_ENCODING, encode_image
+from render_cache import board_key, render_cache
+from sprites import piece_sprite
 
 # Draw a chess board and pieces from a python-chess board object
 def draw_board(board, square_size=80):
-    board_size = 8 * square_size
-    light = (240, 217, 181)
-    dark = (181, 136, 99)
-
-    # Create blank image
-    img = Image.new("RGB", (board_size, board_size), "white")
-    draw = ImageDraw.Draw(img)
-
-    # Draw squares
-    for rank in range(8):
-        for file in range(8):
-            color = light if (rank + file) % 2 == 0 else dark
-            top_left = (file * square_size, (7 - rank) * square_size)
-            bottom_right = ((file + 1) * square_size, (8 - rank) * square_size)
-            draw.rectangle([top_left, bottom_right], fill=color)
+    key = board_key(board, "classic", square_size)
+    return render_cache.get_or_render(key, lambda: render_board(board, square_size))
+
+# Same as draw_board, but returns encoded bytes ready for st.image.
+# With workers > 0 the render runs in the shared render_service process pool.
+def draw_board_bytes(board, square_size=80, encoding=DEFAULT_ENCODING, workers=0):
+    from render_service import render_encoded
+
+    key = board_key(board, "classic", square_size, encoding=encoding)
+    render_local = lambda: encode_image(render_board(board, square_size), encoding)
+    return render_cache.get_or_render(key, lambda: render_encoded(key, render_local, workers))
+
+def render_board(board, square_size=80):
+    img = background_layer("classic", square_size).copy()
 
     # Place pieces
     for square in chess.SQUARES:
         piece = board.piece_at(square)
         if piece:
-            piece_symbol = piece.symbol()
             file = chess.square_file(square)
             rank = chess.square_rank(square)
 
-            piece_file = os.path.join(ASSET_PATH, f"{'w' if piece_symbol.isupper() else 'b'}{piece_symbol.upper()}.png")
-            if os.path.exists(piece_file):
-                piece_img = Image.open(piece_file).resize((square_size, square_size), Image.Resampling.LANCZOS)
+            sprite = piece_sprite(piece, square_size)
+            if sprite:
+                piece_img, mask = sprite
                 x = file * square_size
                 y = (7 - rank) * square_size
-                img.paste(piece_img, (x, y), piece_img.convert("RGBA"))
+                img.paste(piece_img, (x, y), mask)
 
     return img
+
+# Engine-free fallback AI, used when Stockfish is missing or too busy
+def get_basic_ai_move(board):
+    """Simple AI that prioritizes captures, then random moves"""
+    legal_moves = list(board.legal_moves)
+    if not legal_moves:
+        return None
+
+    # Prioritize captures
+    captures = [move for move in legal_moves if board.is_capture(move)]
+    if captures:
+        return random.choice(captures)
+
+    # Then checks
+    checks = []
+    for move in legal_moves:
+        board_copy = board.copy()
+        board_copy.push(move)
+        if board_copy.is_check():
+            checks.append(move)
+    if checks:
+        return random.choice(checks)
+
+    # Random move
+    return random.choice(legal_moves)